@@ -1,16 +1,17 @@
 
 # - format connectivity lines -
-# get connectivity data for PLD of 21 days
+# get connectivity data for every PLD in the simulation outputs
 # average across all time periods
 # (community detection env)
 
 import os
 import pandas as pd
 import geopandas as gp
+import connavg
 
 root = r'C:\Users\jcristia\Documents\GIS\MSc_Projects\Impacts_connectivity_chap3'
 out_gdb = os.path.join(root, 'spatial/connectivity.gdb')
-conn_lines = r'C:\Users\jcristia\Documents\GIS\MSc_Projects\Hakai_chap1\scripts_runs_cluster\seagrass\seagrass_{}\shp_merged\connectivity_pld21.shp'
+conn_dirs = r'C:\Users\jcristia\Documents\GIS\MSc_Projects\Hakai_chap1\scripts_runs_cluster\seagrass\seagrass_{}\shp_merged'
 time_periods = [
     '20200228_SS201701', '20200309_SS201705', '20200309_SS201708',
     '20200310_SS201101', '20200310_SS201105', '20200310_SS201108',
@@ -18,36 +19,29 @@ time_periods = [
 ]
 
 
-# get all the shapefiles for a pld across all times
-files = []
+# get the output directory of each time period. All connectivity_pld*.shp in
+# a directory get read in one go.
+dirs = []
 for sim in time_periods:
-    file = conn_lines.format(sim)
-    files.append(file)
-
-# put them all in geodataframe
-gdf_all = gp.GeoDataFrame()
-for shp in files:
-    gdf = gp.read_file(shp)
-    gdf_all = gdf_all.append(gdf)
-gdf_all = gdf_all.astype({'from_id':int, 'to_id':int}) # there's still a mix of datatypes in the columns for some reason. This was super important to do or else the code below didn't recognize duplicates.
-
-# function to average lines across time periods
-def mean_cust_denom(x):
-    s = x.sum()
-    m = s/float(len(time_periods))
-    return m
+    d = conn_dirs.format(sim)
+    dirs.append(d)
 
 # average
-gdf_group = gdf_all.groupby(['from_id', 'to_id']).agg(
-    freq = ('from_id', 'count'),
-    prob_avg = ('prob', mean_cust_denom),
-    totalori = ('totalori', 'sum'),
-    totquant = ('quantity', 'sum'),
-    geometry = ('geometry', 'first'),
-    )
-gdf_group = gdf_group.astype({'totalori':int, 'totquant':int})
-gdf_group = gdf_group.reset_index()
-
-# output
-gdf_f = gp.GeoDataFrame(gdf_group, crs=gdf.crs)
-gdf_f.to_file(filename=os.path.join(root, 'conn_avg_pld21.shp'), driver='ESRI Shapefile')
\ No newline at end of file
+# Time periods are read in parallel and folded into running per-edge sums as
+# they come back. I used to append everything into one geodataframe and then
+# groupby, but that kept every line of every period in memory. See connavg.py.
+# The sums are saved, so if I add a time period to the list above only that
+# one gets read. Delete the accumulator file to start over.
+acc_file = os.path.join(root, 'conn_avg_acc.parquet')
+cube_file = os.path.join(root, 'conn_avg_cube.parquet')
+
+if __name__ == '__main__':
+
+    acc = connavg.EdgeAccumulator.load(acc_file)
+    acc.update(dirs)
+    acc.save(acc_file)
+
+    # output
+    # (pld x from x to) cube with all PLDs. 002 slices out the PLD it needs
+    # with connavg.read_cube.
+    acc.write_cube(cube_file)
@@ -1,4 +1,3 @@
-
 # output to feature class
 # remove US meadows
 
@@ -10,33 +9,44 @@
 # This makes my life easier by not having to specify a threshold, which will be
 # hard to justify biologically.
 
+# This no longer needs arcpy. The connections come straight out of the cube
+# from 001 and all of the filtering is done on the edge table.
 
-import arcpy
+import os
 import pandas as pd
-import networkx as nx
+import geopandas as gp
 import numpy as np
+import connavg
 
 root = r'C:\Users\jcristia\Documents\GIS\MSc_Projects\Impacts_connectivity_chap3'
 out_gdb = os.path.join(root, 'spatial/connectivity.gdb')
-arcpy.env.workspace = out_gdb
-shp = os.path.join(root, 'conn_avg_pld21.shp')
+pld = 21
+conn_cube = os.path.join(root, 'conn_avg_cube.parquet') # all PLDs, from 001
 seagrass = r'C:\Users\jcristia\Documents\GIS\MSc_Projects\Hakai_chap1\scripts_runs_localstage\seagrass\seagrass\seagrass_20200228_SS\seagrass_prep\seagrass.gdb\seagrass_all_19FINAL'
-
-
-# output to feature class
-fc = 'conn_avg_pld21'
-if not arcpy.Exists(fc):
-    arcpy.CopyFeatures_management(shp, fc)
-    arcpy.Delete_management(shp)
-
-# remove US meadow connections that are not part of a strongly connected 
-# component that contains a Canadian meadow. There's no point in keeping US 
+# rule 2 of the US removal below never did anything in the version used for
+# the published analysis. True actually applies it, which removes more US
+# connections and changes conn_avg_pld*_noUS and everything after it (003,
+# 108, 110, 200-204).
+apply_rule2 = False
+us_file = os.path.join(root, 'us_meadows.json') # list of US meadows (110 and 200 use it)
+
+
+# connections for this PLD
+fc = f'conn_avg_pld{pld}'
+conns = connavg.read_cube(
+    conn_cube,
+    pld,
+    columns=['from_id', 'to_id', 'freq', 'prob_avg', 'prob_var', 'totalori', 'totquant'],
+    geometry=True)
+
+# remove US meadow connections that are not part of a strongly connected
+# component that contains a Canadian meadow. There's no point in keeping US
 # meadows that are sources if they are not part of a loop.
 # This is not perfect though, for instance a US meadow that is just a source
 # to a Canadian meadow might be part of a loop in the states and the Canadian
 # meadow could be just a sink to that strongly connected component.
 # There may also be complex loops within the states that link back to Canada.
-# HOWEVER, given the lack of impact data for US meadows, I think I can limit 
+# HOWEVER, given the lack of impact data for US meadows, I think I can limit
 # what I include. I just need to show that I considered it.
 # I could write something like: "We only included meadows in the states if they
 # were part of loops including Canadian meadows. While this may exclude complex
@@ -45,78 +55,24 @@ if not arcpy.Exists(fc):
 
 # I made a selection poly for the US meadows since I never identified which uIDs
 # are associated with US meadows.
-spat_select = arcpy.SelectLayerByLocation_management(
-    seagrass,
-    'COMPLETELY_WITHIN',
-    'select_US_poly')
-cursor = arcpy.da.SearchCursor(spat_select, ['uID'])
-us_uids = [row[0] for row in cursor]
-
-
-# get uIDs of US meadows that are part of a strongly connected component that
-# contains at least 1 Canadian meadow
-# read in conns as pandas df
-field_names = [i.name for i in arcpy.ListFields(fc)]
-cursor = arcpy.da.SearchCursor(fc, field_names)
-conns_df = pd.DataFrame(data=[row for row in cursor], columns=field_names)
-conns_df = conns_df.drop(['OBJECTID', 'Shape', 'freq', 'totalori', 'totquant', 'Shape_Length'], 1)
-
-# create directed graph
-G = nx.from_pandas_edgelist(
-    conns_df, 
-    source='from_id', 
-    target='to_id', 
-    edge_attr='prob_avg', 
-    create_using=nx.DiGraph)
-# identify strongly connected components
-comps_strong = nx.strongly_connected_components(G)
+# A meadow is a US meadow if it is completely within the selection poly. This
+# is one vectorized query against the poly instead of a selection.
+sg = gp.read_file(os.path.dirname(seagrass), layer=os.path.basename(seagrass), columns=['uID'])
+us_poly = gp.read_file(out_gdb, layer='select_US_poly').to_crs(sg.crs)
+sg_idx, _ = us_poly.sindex.query(sg.geometry, predicate='within')
+us_uids = np.unique(sg.uID.values[sg_idx])
 
-# add field, give all rows -1 to start
-conns_df[f'component_strong'] = -1
-# each component is listed as SET type, which are unordered, unchangeable and don't allow duplicates
-i = 1
-for comp in comps_strong:
-    c = list(comp)
-    if len(c)==1:
-        continue
-    # add a component id to connection dataframe
-    conns_df[f'component_strong'] = np.where(
-        ((conns_df.from_id.isin(c)) & (conns_df.to_id.isin(c))),
-        i,  # change it to i
-        conns_df[f'component_strong'] # or keep it the same
-    )
-    i+=1
 
+# save the list of US meadows so that 110 and 200 can drop the same
+# connections for any PLD straight from the cube (see connavg.us_keep)
+connavg.save_us(us_file, us_uids, apply_rule2)
 
-arcpy.CopyFeatures_management(fc, 'conn_avg_pld21_noUS')
-
-
-#get list of US meadows that are sources to Canada meadows
-us_sources = []
-with arcpy.da.SearchCursor('conn_avg_pld21_noUS', ['from_id', 'to_id']) as cursor:
-    for row in cursor:
-        if row[0] in us_uids and row[1] not in us_uids:
-            if row[0] not in us_sources:
-                us_sources.append(row[0])
-
-# remove connections
-# There was probably a more elegant way to do this in fewer criteria.
-with arcpy.da.UpdateCursor('conn_avg_pld21_noUS', ['from_id', 'to_id']) as cursor:
-    for row in cursor:
-
-        # remove if both meadows in the us and the source meadow is not also a source to Canada
-        if (row[0] in us_uids and row[1] in us_uids) and (row[0] not in us_sources):
-            cursor.deleteRow()
-            continue
-
-        # remove if from or to is in the us and it is not part of a strongly connected component
-        comp_id = conns_df.component_strong[(conns_df.from_id == row[0]) & (conns_df.to_id==row[1])]
-        if (row[0] in us_uids or row[1] in us_uids) and comp_id.item==-1:
-            cursor.deleteRow()
-            continue
-
-        # remove if it is a connection to the states and it is not a US source
-        if row[1] in us_uids and row[1] not in us_sources:
-            cursor.deleteRow()
+# remove US meadow connections that aren't part of a loop with Canada
+# (all the rules are one mask over the edge table, see connavg.us_keep)
+remove = ~connavg.us_keep(conns.from_id.values, conns.to_id.values, us_uids, apply_rule2)
 
 
+# output to feature class
+# one bulk write for each
+conns.to_file(out_gdb, layer=fc, driver='OpenFileGDB')
+conns[~remove].to_file(out_gdb, layer=f'{fc}_noUS', driver='OpenFileGDB')
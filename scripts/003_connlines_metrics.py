@@ -2,10 +2,11 @@
 # (I may not actually this in the chapter)
 
 import networkx as nx
-import arcpy
 import numpy as np
 import pandas as pd
 import os
+import attrjoin
+import centrality
 
 
 
@@ -13,56 +14,69 @@ root = r'C:\Users\jcristia\Documents\GIS\MSc_Projects\Impacts_connectivity_chap3
 gdb = os.path.join(root, 'spatial/connectivity.gdb')
 conn_lines = 'conn_avg_pld21_noUS'
 centroids = r'C:\Users\jcristia\Documents\GIS\MSc_Projects\Hakai_chap1\scripts_runs_cluster\seagrass\seagrass_20200228_SS201701\shp_merged\patch_centroids.shp'
-arcpy.env.workspace = gdb
-
-# copy centroids to new gdb
-out_pts = 'conn_metrics_pld21'
-arcpy.CopyFeatures_management(centroids, out_pts)
-
-# to dataframe
-arr = arcpy.da.FeatureClassToNumPyArray(conn_lines, ('from_id', 'to_id', 'prob_avg'))
-df = pd.DataFrame(arr)
-
-# remove self connections
-df = df[df.from_id != df.to_id]
-
-# calc metrics
-G = nx.from_pandas_edgelist(df, source='from_id', target='to_id', edge_attr='prob_avg', create_using=nx.DiGraph)
-
-bt = nx.betweenness_centrality(G, k=None, normalized=True, weight='prob_avg', endpoints=False, seed=None)
-dca = nx.degree_centrality(G)
-dci = nx.in_degree_centrality(G)
-dco = nx.out_degree_centrality(G)
-
-# add metrics as node attributes
-nx.set_node_attributes(G, bt, 'bt')
-nx.set_node_attributes(G, dca, "dca")
-nx.set_node_attributes(G, dci, "dci")
-nx.set_node_attributes(G, dco, "dco")
-
-
-df_att = pd.DataFrame({
-    'node':list(G.nodes), 
-    'bt':bt.values(),
-    'dca':dca.values(),
-    'dci':dci.values(),
-    'dco':dco.values()
-        })
-
-
-metrics = ['bt', 'dca', 'dci', 'dco']
-for field in metrics:
-    arcpy.AddField_management(out_pts, field, 'DOUBLE')
-
-fields = metrics[:]  # need to be careful how I copy lists
-fields.append('uID')        
-with arcpy.da.UpdateCursor(out_pts, fields) as cursor:
-    for row in cursor:
-        if row[-1] not in df_att.node.values:
-            cursor.deleteRow()
-            continue # I should only need this for testing
-        dftemp = df_att[df_att.node==row[-1]]
-        for i,m in enumerate(metrics):
-            row[i] = dftemp[m].values[0]
-        cursor.updateRow(row)
-
+# betweenness: None for exact, or a number of sampled source meadows for a
+# quicker estimate (this also outputs bt_se, the standard error)
+bt_k = None
+bt_seed = 42
+
+# the betweenness process pool re-imports this script on Windows, so
+# everything below has to be behind this
+if __name__ == '__main__':
+
+    # output points in the connectivity gdb
+    out_pts = os.path.join(gdb, 'conn_metrics_pld21')
+
+    # to dataframe
+    df = attrjoin.read_layer(
+        os.path.join(gdb, conn_lines),
+        columns=['from_id', 'to_id', 'prob_avg'],
+        read_geometry=False)
+
+    # remove self connections
+    df = df[df.from_id != df.to_id]
+
+    # calc metrics
+    G = nx.from_pandas_edgelist(df, source='from_id', target='to_id', edge_attr='prob_avg', create_using=nx.DiGraph)
+
+    # betweenness uses -log(prob_avg) as the path length so that the most probable
+    # routes are the shortest ones, and is spread across processes. See
+    # centrality.py.
+    df_bt = centrality.betweenness(df.from_id, df.to_id, df.prob_avg, k=bt_k, seed=bt_seed)
+    bt = dict(zip(df_bt.node, df_bt.bt))
+    dca = nx.degree_centrality(G)
+    dci = nx.in_degree_centrality(G)
+    dco = nx.out_degree_centrality(G)
+
+    # add metrics as node attributes
+    nx.set_node_attributes(G, bt, 'bt')
+    nx.set_node_attributes(G, dca, "dca")
+    nx.set_node_attributes(G, dci, "dci")
+    nx.set_node_attributes(G, dco, "dco")
+
+
+    df_att = pd.DataFrame({
+        'node':list(G.nodes), 
+        'bt':[bt[n] for n in G.nodes],
+        'dca':[dca[n] for n in G.nodes],
+        'dci':[dci[n] for n in G.nodes],
+        'dco':[dco[n] for n in G.nodes]
+            })
+
+
+    metrics = ['bt', 'dca', 'dci', 'dco']
+    if bt_k is not None:
+        df_att = df_att.merge(df_bt[['node', 'bt_se']], on='node')
+        metrics.append('bt_se')
+
+    # PageRank, eigenvector centrality and source/sink strength
+    # (sparse power iteration, see centrality.py)
+    df_spec = centrality.spectral_metrics(
+        df.from_id.values, df.to_id.values, {'prob': df.prob_avg.values})
+    df_att = df_att.merge(df_spec, on='node')
+    metrics.extend(['pr_prob', 'ev_prob', 'srcstr_prob', 'snkstr_prob'])
+
+    # join metrics to the centroids by uID and write them out in one go
+    # centroids that aren't in the network get dropped (I should only need this
+    # for testing)
+    df_att = df_att.rename(columns={'node':'uID'})
+    attrjoin.join_write(centroids, df_att, out_path=out_pts, key='uID', columns=metrics, how='inner')
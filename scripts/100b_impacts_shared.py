@@ -0,0 +1,45 @@
+# make the buffers and land tiles that more than one of 101-103 use, once,
+# before they run
+
+# 101 and 103 both buffer sg_101_retrace by 100m, 102 and 103 both need the
+# land tiles. When the impact scripts run at the same time (pipeline.py) they
+# would each make these at the same time. Here they get made once and saved in
+# the cache (geocache.py). 101-103 then just load them from there (they're
+# never written to again, only read). Nothing changes in 101-103: the cache
+# is keyed on what's in the layers (the land file for the tiles, see
+# coastline.py), so as long as the layers get read the same way the scripts
+# read them, they find these.
+
+import os
+import attrjoin
+import geoproc
+import geocache
+import coastline
+
+root = r'C:\Users\jcristia\Documents\GIS\MSc_Projects\Impacts_connectivity_chap3\spatial'
+cache_dir = os.path.join(root, 'geocache')
+sg_retrace = os.path.join(root, 'main_seagrass.gdb/sg_101_retrace')
+sg_canada = os.path.join(root, 'main_seagrass.gdb/sg_2_canada')
+land = os.path.join(root, 'main_seagrass.gdb/coastline_bc_ak_wa_or_cleaned_less10000')
+# list of what got made (pipeline.py checks this file)
+manifest = os.path.join(cache_dir, 'shared.json')
+
+
+# land tiles (101, 102, 103)
+land_tiles = coastline.keyed_tiles(land, cache_dir)
+
+# 100m buffers (101, 103) and the part on land (103)
+sg_101_retrace = geoproc.read_layer(sg_retrace)
+sg_102_buff100 = geocache.cached(cache_dir, geoproc.buffer, sg_101_retrace, 100)
+sg_103_clipcoast = geocache.cached(cache_dir, coastline.clip, sg_102_buff100, land_tiles)
+
+# 1km buffers in the water (102)
+sg = geoproc.read_layer(sg_canada)
+sg_01_buff1km = geocache.cached(cache_dir, geoproc.buffer, sg, 1000)
+sg_02_erase = geocache.cached(cache_dir, coastline.erase, sg_01_buff1km, land_tiles)
+
+attrjoin.atomic_json({
+    'land_tiles': land_tiles.key,
+    'sg_102_buff100': geocache.layer_hash(sg_102_buff100),
+    'sg_103_clipcoast': geocache.layer_hash(sg_103_clipcoast),
+    'sg_02_erase': geocache.layer_hash(sg_02_erase)}, manifest, indent=1)
@@ -1,14 +1,26 @@
 # calculate percent of shoreline modification in 100m buffer on land
 
-import arcpy
+# No arcpy. Everything stays in memory (geoproc.py) and only the layers that
+# other scripts use get written to the gdb.
+
 import os
+import pandas as pd
+import geopandas as gp
+import numpy as np
+import shapely
+import geoproc
+import geocache
+import coastline
+import joinagg
+import artifacts
 
 
 
 
 root = r'C:\Users\jcristia\Documents\GIS\MSc_Projects\Impacts_connectivity_chap3\spatial'
-gdb = r'shoreline_modification.gdb'
-arcpy.env.workspace = os.path.join(root, gdb)
+cache_dir = os.path.join(root, 'geocache') # buffers, clips etc. that don't need redoing
+gdb = os.path.join(root, 'shoreline_modification.gdb')
+store = artifacts.Store(os.path.join(root, 'artifacts')) # layers 105 uses
 
 sg_retrace = os.path.join(root, 'main_seagrass.gdb/sg_101_retrace')
 land = os.path.join(root, 'main_seagrass.gdb/coastline_bc_ak_wa_or_cleaned_less10000')
@@ -20,21 +32,25 @@ mod_Katherine = os.path.join(root, 'shoreline_modification/Katherine/EelgrassCon
 # programatically recreate buffers (I first created these manually in another
 # geodatabase)
 # shoreline_modification/shoreline_modification_ARCHIVED20210224.gdb
-arcpy.CopyFeatures_management(sg_retrace, 'sg_101_retrace')
-arcpy.Buffer_analysis('sg_101_retrace', 'sg_102_buff100m', 100)
-arcpy.Clip_analysis('sg_102_buff100m', land, 'sg_103_clipcoast')
+sg_101_retrace = geoproc.read_layer(sg_retrace)
+# (cached until the meadows or land change, see geocache.py)
+sg_102_buff100m = geocache.cached(cache_dir, geoproc.buffer, sg_101_retrace, 100)
+# (the land in tiles, so each buffer only gets clipped with the coast near it)
+land_tiles = coastline.keyed_tiles(land, cache_dir)
+sg_103_clipcoast = geocache.cached(cache_dir, coastline.clip, sg_102_buff100m, land_tiles)
+sg_103_clipcoast = geoproc.add_geometry_fields(sg_103_clipcoast)
 
 # recreate roads
-arcpy.Clip_analysis(roads, 'sg_103_clipcoast', 'roads_01_clip')
+# (only the roads near the buffers get read from the road atlas)
+roads_01_clip = geoproc.clip(geoproc.read_near(roads, sg_103_clipcoast), sg_103_clipcoast)
 # Buffer based on land width - 4m per lane
-arcpy.AddField_management('roads_01_clip', 'lane_width', 'SHORT')
-with arcpy.da.UpdateCursor('roads_01_clip', ['TOTAL_NUMBER_OF_LANES', 'lane_width']) as cursor:
-    for row in cursor:
-        row[1] = row[0] * 2
-        cursor.updateRow(row)
-arcpy.Buffer_analysis('roads_01_clip', 'roads_02_buff8m', 'lane_width', 'FULL')
-arcpy.Clip_analysis('roads_02_buff8m', 'sg_103_clipcoast', 'roads_03_clip')
-arcpy.Dissolve_management('roads_03_clip', 'roads_04_dissolve', multi_part='SINGLE_PART')
+# (buffer distance is per road, from the lane_width field)
+roads_01_clip['lane_width'] = roads_01_clip.TOTAL_NUMBER_OF_LANES.fillna(0).to_numpy(dtype=np.int16) * 2
+roads_02_buff8m = geoproc.buffer(roads_01_clip, 'lane_width')
+roads_03_clip = geoproc.clip(roads_02_buff8m, sg_103_clipcoast)
+# dissolved in 5km tiles on all cores and stitched back together
+roads_04_dissolve = geoproc.dissolve_tiled(roads_03_clip, tile_size=5000)
+geoproc.write_layer(roads_04_dissolve, os.path.join(gdb, 'roads_04_dissolve'))
 
 # convert to KMZ
 # I'll keep this as a manual operation. I gave these to Katherine as inputs.
@@ -49,43 +65,19 @@ arcpy.Dissolve_management('roads_03_clip', 'roads_04_dissolve', multi_part='SING
 
 ######################################
 # kmz to fc
-arcpy.KMLToLayer_conversion(
-    mod_Katherine,
-    os.path.join(root, 'shoreline_modification'),
-    'shmod_transfer_TEMP',
-    'NO_GROUNDOVERLAY'    
-)
-polys = os.path.join(root, 'shoreline_modification', 'shmod_transfer_TEMP.gdb', 'Placemarks/Polygons')
-arcpy.Project_management(polys, 'shmod_01_Katherine', 3005)
-arcpy.Delete_management(os.path.join(root, 'shoreline_modification/shmod_transfer_TEMP.gdb'))
-arcpy.Delete_management(os.path.join(root, 'shoreline_modification/shmod_transfer_TEMP.lyrx'))
+shmod_01_Katherine = geoproc.read_kmz(mod_Katherine, 'Polygon').to_crs(3005)
 
 
 #######################################
 # clean up attributes
-arcpy.env.outputZFlag = 'Disabled'
-arcpy.CopyFeatures_management('shmod_01_Katherine', 'shmod_02_cleanattrs')
-arcpy.AddFields_management(
-    'shmod_02_cleanattrs',
-    [
-        ['orig_id', 'TEXT', 'orig_id', 50],
-        ['desc_1', 'TEXT', 'desc_1', 255],
-        ['desc_2', 'TEXT', 'desc_2', 255],
-        ['desc_3', 'TEXT', 'desc_3', 255],
-    ]
-)
-fields = ['Name', 'PopupInfo', 'orig_id', 'desc_1', 'desc_2', 'desc_3']
-with arcpy.da.UpdateCursor('shmod_02_cleanattrs', fields) as cursor:
-    for row in cursor:
-        row[2] = row[0]
-        descriptions = row[1].split(';')
-        row[3]=descriptions[0]
-        if len(descriptions) > 1:
-            row[4]=descriptions[1]
-            if len(descriptions) == 3:
-                row[5]=descriptions[2]
-        cursor.updateRow(row)
-arcpy.DeleteField_management('shmod_02_cleanattrs', ['Name', 'FolderPath', 'SymbolID', 'AltMode', 'Base', 'Clamped', 'Extruded', 'Snippet', 'PopupInfo'])
+# (no z values, like outputZFlag = 'Disabled')
+shmod_02_cleanattrs = shmod_01_Katherine[['geometry']].copy()
+shmod_02_cleanattrs['geometry'] = shapely.force_2d(shmod_01_Katherine.geometry.values)
+shmod_02_cleanattrs['orig_id'] = shmod_01_Katherine.Name
+descriptions = shmod_01_Katherine.PopupInfo.str.split(';', expand=True).reindex(columns=[0, 1, 2])
+shmod_02_cleanattrs['desc_1'] = descriptions[0]
+shmod_02_cleanattrs['desc_2'] = descriptions[1]
+shmod_02_cleanattrs['desc_3'] = descriptions[2]
 
 
 ########################################
@@ -93,25 +85,21 @@ arcpy.DeleteField_management('shmod_02_cleanattrs', ['Name', 'FolderPath', 'Symb
 
 # spatial tools like Erase are not working on shmod because there are a lot of
 # geometry errors (self intersections, repeat points, etc) Clean these up first.
-arcpy.CopyFeatures_management('shmod_02_cleanattrs', 'shmod_03_repairGeom')
-arcpy.CheckGeometry_management('shmod_03_repairGeom', 'shmod_03b_checkGeom')
-arcpy.RepairGeometry_management('shmod_03_repairGeom')
-arcpy.CheckGeometry_management('shmod_03_repairGeom', 'shmod_03c_checkGeom') # there shouldn't be any row now
+print('invalid geometries before repair: {}'.format((~shmod_02_cleanattrs.is_valid).sum()))
+shmod_03_repairGeom = geoproc.repair(shmod_02_cleanattrs)
+print('invalid geometries after repair: {}'.format((~shmod_03_repairGeom.is_valid).sum())) # there shouldn't be any now
 
 # erase with roads
-arcpy.Erase_analysis('shmod_03_repairGeom', 'roads_04_dissolve', 'shmod_04_eraseRoads')
+shmod_04_eraseRoads = geoproc.erase(shmod_03_repairGeom, roads_04_dissolve)
 # merge with roads
-arcpy.Merge_management(['shmod_04_eraseRoads', 'roads_04_dissolve'], 'shmod_05_merge')
+shmod_05_merge = gp.GeoDataFrame(
+    pd.concat([shmod_04_eraseRoads, roads_04_dissolve], ignore_index=True),
+    crs=shmod_04_eraseRoads.crs)
 # clip to original 100m buffers
-arcpy.Clip_analysis('shmod_05_merge', 'sg_103_clipcoast', 'shmod_06_clip')
+shmod_06_clip = geoproc.clip(shmod_05_merge, sg_103_clipcoast[['geometry']])
 
 # attributes
-arcpy.DeleteField_management('shmod_06_clip', ['GEOMETRY_Length', 'GEOMETRY_Area'])
-with arcpy.da.UpdateCursor('shmod_06_clip', ['desc_1']) as cursor:
-    for row in cursor:
-        if row[0] == None:
-            row[0] = 'road'
-        cursor.updateRow(row)
+shmod_06_clip['desc_1'] = shmod_06_clip.desc_1.fillna('road')
 
 
 #########################################
@@ -123,80 +111,50 @@ with arcpy.da.UpdateCursor('shmod_06_clip', ['desc_1']) as cursor:
 # there a few places where it would be significant. See uid 280 and 291.
 # So I need to split these features up by the buffer feature class.
 # It looks like the most straightforward way is Identity.
-arcpy.Identity_analysis('shmod_06_clip', 'sg_103_clipcoast', 'shmod_07_identity', 'ONLY_FID')
-# bit it creates identical features where there is overlap
-arcpy.DeleteIdentical_management('shmod_07_identity', ['Shape'])
-arcpy.DeleteField_management('shmod_07_identity', ['FID_shmod_06_clip', 'FID_sg_103_clipcoast'])
+# (identical features where there is overlap get deleted)
+shmod_07_identity = geoproc.identity(shmod_06_clip, sg_103_clipcoast)
+shmod_07_identity = geoproc.add_geometry_fields(shmod_07_identity)
+store.put('shmod_07_identity', shmod_07_identity, checkpoint=True)
 
 # note the "contains". Can't do intersect here.
-arcpy.SpatialJoin_analysis(
-    'sg_103_clipcoast',
-    'shmod_07_identity',
-    'sg_104_sjoin',
-    'JOIN_ONE_TO_MANY',
-    'KEEP_ALL',
-    match_option='CONTAINS'
-)
-
-arcpy.Frequency_analysis('sg_104_sjoin', 'sg_105_freqArea', ['uID'], ['Shape_Area_1']) # this is the area from the shmods
-arcpy.env.qualifiedFieldNames = False # prevent table being part of field names in 
-joined_table = arcpy.AddJoin_management('sg_103_clipcoast', 'uID', 'sg_105_freqArea', 'uID')
-arcpy.CopyFeatures_management(joined_table, 'sg_106_AREA')
+# (spatial join and frequency in one step, see joinagg.py)
+shmod_stats = {
+    'FREQUENCY': (None, 'count'),
+    'Shape_Area_1': ('Shape_Area', 'sum'), # this is the area from the shmods
+}
+drop_fields = ['area', 'traced', 'BUFF_DIST', 'ORIG_FID', 'OBJECTID_1', 'uID_1', 'Shape_Area_1']
+
+sg_105_freqArea = joinagg.join_aggregate(
+    sg_103_clipcoast, shmod_07_identity, shmod_stats, predicate='contains')
+sg_106_AREA = sg_103_clipcoast.merge(sg_105_freqArea, on='uID', how='left')
+sg_106_AREA['FREQUENCY'] = geoproc.join_frequency(sg_106_AREA.FREQUENCY) # 1 with no shmods, like arcpy
 
 # clean up attributes
-arcpy.AddFields_management(
-    'sg_106_AREA',
-    [
-        ['shmod_area', 'DOUBLE', 'shmod_area'],
-        ['shmod_percent', 'DOUBLE', 'shmod_percent']
-    ]
-)
-with arcpy.da.UpdateCursor('sg_106_AREA', ['Shape_Area_1', 'Shape_Area', 'shmod_area', 'shmod_percent']) as cursor:
-    for row in cursor:
-        if row[0] ==  None:
-            row[2]=0.0
-            row[3]=0.0
-        else:
-            row[2]=row[0]
-            row[3]=row[0]/row[1] * 100
-        cursor.updateRow(row)
-arcpy.DeleteField_management('sg_106_AREA', ['area', 'traced', 'BUFF_DIST', 'ORIG_FID', 'OBJECTID_1', 'uID_1', 'Shape_Area_1'])
+sg_106_AREA['shmod_area'] = sg_106_AREA.Shape_Area_1.fillna(0.0)
+sg_106_AREA['shmod_percent'] = sg_106_AREA.shmod_area / sg_106_AREA.Shape_Area * 100
+sg_106_AREA = sg_106_AREA.drop(columns=drop_fields, errors='ignore')
+geoproc.write_layer(sg_106_AREA, os.path.join(gdb, 'sg_106_AREA'))
 
 # sg_106_AREA is my primary output. It contains:
 # shmod_area: the area of all the shoreline modification in the 100m buffer
 # shmod_percent: the percentage of the buffer the is modified
 
 # output to point
-arcpy.FeatureToPoint_management('sg_106_AREA', 'sg_106_AREA_pt', 'INSIDE')
+geoproc.write_layer(geoproc.to_points(sg_106_AREA), os.path.join(gdb, 'sg_106_AREA_pt'))
 
 
 ##################################################
 
 # calculate % by modification type
 
-arcpy.Frequency_analysis('sg_104_sjoin', 'sg_105_freqArea_type', ['uID', 'desc_1'], ['Shape_Area_1'])
-arcpy.env.qualifiedFieldNames = False
-joined_table = arcpy.AddJoin_management('sg_103_clipcoast', 'uID', 'sg_105_freqArea_type', 'uID')
-arcpy.CopyFeatures_management(joined_table, 'sg_106_AREA_type')
+sg_105_freqArea_type = joinagg.join_aggregate(
+    sg_103_clipcoast, shmod_07_identity, shmod_stats, predicate='contains', by='desc_1')
+sg_106_AREA_type = sg_103_clipcoast.merge(sg_105_freqArea_type, on='uID', how='left')
 
 # clean up attributes
-arcpy.AddFields_management(
-    'sg_106_AREA_type',
-    [
-        ['shmod_area', 'DOUBLE', 'shmod_area'],
-        ['shmod_percent', 'DOUBLE', 'shmod_percent']
-    ]
-)
-with arcpy.da.UpdateCursor('sg_106_AREA_type', ['Shape_Area_1', 'Shape_Area', 'shmod_area', 'shmod_percent']) as cursor:
-    for row in cursor:
-        if row[0] ==  None:
-            row[2]=0.0
-            row[3]=0.0
-        else:
-            row[2]=row[0]
-            row[3]=row[0]/row[1] * 100
-        cursor.updateRow(row)
-arcpy.DeleteField_management('sg_106_AREA_type', ['area', 'traced', 'BUFF_DIST', 'ORIG_FID', 'OBJECTID_1', 'uID_1', 'Shape_Area_1'])
-
-arcpy.FeatureToPoint_management('sg_106_AREA_type', 'sg_106_AREA_type_pt', 'INSIDE')
+sg_106_AREA_type['shmod_area'] = sg_106_AREA_type.Shape_Area_1.fillna(0.0)
+sg_106_AREA_type['shmod_percent'] = sg_106_AREA_type.shmod_area / sg_106_AREA_type.Shape_Area * 100
+sg_106_AREA_type = sg_106_AREA_type.drop(columns=drop_fields, errors='ignore')
+geoproc.write_layer(sg_106_AREA_type, os.path.join(gdb, 'sg_106_AREA_type'))
 
+geoproc.write_layer(geoproc.to_points(sg_106_AREA_type), os.path.join(gdb, 'sg_106_AREA_type_pt'))
@@ -4,56 +4,53 @@
 # There were a few errors and some rows had to be deleted. See her email and the
 # original csv for reference.
 
-import arcpy
+# No arcpy. Everything stays in memory (geoproc.py) and only the result gets
+# written to the gdb.
+
 import os
+import numpy as np
+import pandas as pd
+import geoproc
+import proximity
 
 
 root = r'C:\Users\jcristia\Documents\GIS\MSc_Projects\Impacts_connectivity_chap3\spatial'
-outgdb = 'greencrab.gdb'
+outgdb = os.path.join(root, 'greencrab.gdb')
 gc_csv = os.path.join(root, 'green_crab/AllEGCPresenceRecords_DFO2020.csv')
 sg_retrace = os.path.join(root, 'main_seagrass.gdb/sg_101_retrace')
-arcpy.env.workspace = os.path.join(root, outgdb)
 
 # import points
-arcpy.MakeXYEventLayer_management(gc_csv, 'startLONG', 'startLAT', 'gc_lyr', 4326)
-arcpy.CopyFeatures_management('gc_lyr', 'greencrab_01_points')
-arcpy.Delete_management('gc_lyr')
-
-
-# Buffer points by 1.5 km - this is based off a visual assessment of the few
-# points in the salish sea and the nearby meadows that could be realisticaly
-# reached from the meadow with the point. If points get added then I will need
-# to redo this assessment.
-# Don't rely on the 1.5 km buffer.
-arcpy.Project_management('greencrab_01_points', 'greencrab_02_project', 3005)
-arcpy.Buffer_analysis('greencrab_02_project', 'greencrab_03_buff', 1500)
-
-# join to seagrass
-arcpy.SpatialJoin_analysis(
-    sg_retrace,
-    'greencrab_03_buff',
-    'sg_02_sjoin',
-    'JOIN_ONE_TO_MANY',
-    'KEEP_ALL',
-    match_option='INTERSECT'
-)
-arcpy.AddField_management('sg_02_sjoin', 'gc_presence', 'SHORT')
-with arcpy.da.UpdateCursor('sg_02_sjoin', ['ORIG_FID','gc_presence']) as cursor:
-    for row in cursor:
-        if row[0] == None:
-            row[1] = 0
-        else:
-            row[1] = 1
-        cursor.updateRow(row)
-arcpy.Frequency_analysis('sg_02_sjoin', 'sg_03_freq', 'uID', 'gc_presence')
+greencrab_01_points = geoproc.xy_to_points(pd.read_csv(gc_csv), 'startLONG', 'startLAT', 4326)
+
+
+# Points within 1.5 km of a meadow - this is based off a visual assessment of
+# the few points in the salish sea and the nearby meadows that could be
+# realisticaly reached from the meadow with the point. If points get added then
+# I will need to redo this assessment.
+# Don't rely on the 1.5 km distance.
+# (this used to be a 1.5 km buffer of the points and a spatial join, now it is
+# the distance from the meadow to the points, see proximity.py)
+gc_distance = 1500
+# other distances to check how much the choice matters (sensitivity table)
+gc_radii = [500, 1000, 1500, 2000, 3000]
+greencrab_02_project = greencrab_01_points.to_crs(3005)
+sg = geoproc.read_layer(sg_retrace)
+gc_pairs = proximity.PointTree(greencrab_02_project).pairs(sg, max(gc_radii + [gc_distance]))
+gc_count = proximity.within(gc_pairs, len(sg), gc_distance)
+sg_03_freq = pd.DataFrame({
+    'uID': sg.uID.to_numpy(),
+    'FREQUENCY': geoproc.join_frequency(gc_count)}) # 1 with no points, like arcpy
 
 # my metric is simply that EGC is present. I'm not interested in the number of
 # points
-with arcpy.da.UpdateCursor('sg_03_freq', ['gc_presence']) as cursor:
-    for row in cursor:
-        if row[0] >= 1:
-            row[0] = 1
-        cursor.updateRow(row)
+sg_03_freq['gc_presence'] = (gc_count > 0).astype(np.int16)
+geoproc.write_layer(sg_03_freq, os.path.join(outgdb, 'sg_03_freq'))
+
+# same for every distance in gc_radii, in one pass (uID x radius x stressor)
+sg_04_radius = proximity.radius_table(gc_pairs, sg.uID.to_numpy(), gc_radii, {'gc_count': None})
+gc_presence = sg_04_radius.assign(stressor='gc_presence', value=(sg_04_radius.value > 0).astype(float))
+sg_04_radius = pd.concat([sg_04_radius, gc_presence], ignore_index=True)
+geoproc.write_layer(sg_04_radius, os.path.join(outgdb, 'sg_04_radius'))
 
 # sg_03_freq and attribute gc_presence is my result. It is simply a 1/0
-# presence/absence
\ No newline at end of file
+# presence/absence
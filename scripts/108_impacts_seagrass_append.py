@@ -1,33 +1,36 @@
 # append the US meadows I am including to the seagrass feature class
 
-
-import arcpy
+import os
+import pandas as pd
+import geopandas as gp
+import attrjoin
+import meadowtable
 
 root = r'C:\Users\jcristia\Documents\GIS\MSc_Projects\Impacts_connectivity_chap3'
 out_gdb = os.path.join(root, r'spatial\main_seagrass.gdb')
 seagrass_pts = os.path.join (root, 'spatial\connectivity.gdb\conn_metrics_pld21') # this is generated in the 002 script
-arcpy.env.workspace = out_gdb
+sg_attrs = os.path.join(root, r'spatial\sg_attributes.parquet') # from 107
 
 
 # get uIDs from both seagrass datasets
-uIDs_all = [row[0] for row in arcpy.da.SearchCursor(seagrass_pts, ['uID'])]
-uIDs_can = [row[0] for row in arcpy.da.SearchCursor('sg_4_join_norm', ['uID'])]
+uIDs_all = attrjoin.read_layer(seagrass_pts, columns=['uID'], read_geometry=False).uID
+uIDs_can = meadowtable.read(sg_attrs, columns=['uID']).uID
 uIDs_usa = set(uIDs_all) - set(uIDs_can)
 
-# select and append
-sel = arcpy.SelectLayerByAttribute_management(
-    'sg_1_og',
-    'NEW_SELECTION',
-    '"uID" IN {}'.format(str(tuple(uIDs_usa)))
-)
-arcpy.Merge_management(['sg_4_join_norm', sel], 'sg_5_canusa')
+# add the US meadows to the table with a canada/usa field (their impact
+# values stay null, 109 gives them the mean)
+df = pd.DataFrame({'uID': sorted(set(uIDs_can) | uIDs_usa)})
+df['canusa'] = 'can'
+df.loc[df.uID.isin(uIDs_usa), 'canusa'] = 'usa'
+meadowtable.update(sg_attrs, df)
 
-# add canada/usa field
-arcpy.AddField_management('sg_5_canusa', 'canusa', 'TEXT')
-with arcpy.da.UpdateCursor('sg_5_canusa', ['uID', 'canusa']) as cursor:
-    for row in cursor:
-        if row[0] in uIDs_usa:
-            row[1] = 'usa'
-        else:
-            row[1] = 'can'
-        cursor.updateRow(row)
\ No newline at end of file
+# the meadow polygons (no impact fields, those are in the table). This only
+# needs to be remade if the meadows change.
+sg_can = attrjoin.read_layer(os.path.join(out_gdb, 'sg_2_canada'), columns=['uID', 'area'])
+sg_usa = attrjoin.read_layer(
+    os.path.join(out_gdb, 'sg_1_og'), columns=['uID', 'area'],
+    where='"uID" IN {}'.format(str(tuple(uIDs_usa)))
+)
+sg_usa = sg_usa.to_crs(sg_can.crs)
+sg_canusa = gp.GeoDataFrame(pd.concat([sg_can, sg_usa], ignore_index=True), crs=sg_can.crs)
+attrjoin.write_layer(sg_canusa, os.path.join(out_gdb, 'sg_5_canusa'))
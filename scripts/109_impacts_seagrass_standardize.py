@@ -5,25 +5,22 @@
 # when they are used to divide the connection probabilities, I'll get different
 # scales of severity of impacts.
 
-import arcpy
+import os
 import pandas as pd
 import numpy as np
+import meadowtable
+import impacts
 
 root = r'C:\Users\jcristia\Documents\GIS\MSc_Projects\Impacts_connectivity_chap3'
-out_gdb = os.path.join(root, r'spatial\main_seagrass.gdb')
-arcpy.env.workspace = out_gdb
-sg = 'sg_5_canusa'
+sg_attrs = os.path.join(root, r'spatial\sg_attributes.parquet') # from 107/108
 
 
-# read in as pandas df
-field_names = [i.name for i in arcpy.ListFields(sg) if i.type != 'OID']
-cursor = arcpy.da.SearchCursor(sg, field_names)
-df_imp = pd.DataFrame(data=[row for row in cursor], columns=field_names)
-df_imp = df_imp.drop(['area', 'Shape', 'Shape_Length', 'Shape_Area'] , axis=1)
+# read in as pandas df (just the columns needed)
+imp_fields = list(impacts.STRESSORS) # popn, ow_perc, ...
+df_imp = meadowtable.read(sg_attrs, columns=imp_fields + ['canusa'])
 
 # add up impacts (which are individuallly normalized) 
 # and normalize between 0 and 1 again
-imp_fields = ['popn', 'ow_perc', 'smodperc', 'agricult', 'cutblock', 'gcrab']
 df_imp['total'] = df_imp[imp_fields].sum(axis=1)
 # get mean and apply to usa meadows
 # rationale:
@@ -31,12 +28,12 @@ df_imp['total'] = df_imp[imp_fields].sum(axis=1)
 # I think the median makes sense and requires the least explanation. It's a big
 # assumption but it doesn't have a chain of assumptions associated with it.
 median = df_imp.total[df_imp.canusa=='can'].mean()
-df_imp.total[df_imp.canusa=='usa'] = median
+df_imp.loc[df_imp.canusa=='usa', 'total'] = median
 min = df_imp.total.min()
 max = df_imp.total.max()
 df_imp['total_norm_0_1'] = (df_imp.total - min) / (max - min)
 df_imp = df_imp.drop(
-    ['popn', 'ow_perc', 'smodperc', 'agricult', 'cutblock', 'gcrab', 'total', 'canusa'],
+    imp_fields + ['total', 'canusa'],
     axis=1
 )
 
@@ -64,15 +61,6 @@ width = end - start
 df_imp['total_norm_1_100'] = df_imp.total_norm_0_1 * width + start
 
 
-# create table and join back to sg fc
-x = np.array(np.rec.fromrecords(df_imp.values))
-names = df_imp.dtypes.index.tolist()
-x.dtype.names = tuple(names)
-arcpy.da.NumPyArrayToTable(x, os.path.join(arcpy.env.workspace, f'impacts_total_norm'))
-
-arcpy.env.qualifiedFieldNames = False
-jt = arcpy.AddJoin_management(sg, 'uID', 'impacts_total_norm', 'uID')
-arcpy.CopyFeatures_management(jt, 'sg_6_imptotal')
-arcpy.Delete_management('impacts_total_norm')
-arcpy.DeleteField_management('sg_6_imptotal', ['OBJECTID_1', 'uID_1'])
-
+# into the attribute table (sg_6_imptotal is no longer made, 110 reads the
+# table)
+meadowtable.update(sg_attrs, df_imp)
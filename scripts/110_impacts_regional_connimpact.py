@@ -10,32 +10,33 @@
 # (2) calculate the reduction in individual dispersal probabilities based on 
 # local origin impacts (this is used in the metapopulation model)
 
-import arcpy
 import os
 import pandas as pd
 import numpy as np
+import connavg
+import centrality
+import attrjoin
+import meadowtable
+import impacts
 
 
 root = r'C:\Users\jcristia\Documents\GIS\MSc_Projects\Impacts_connectivity_chap3\spatial'
-outgdb = 'regional_connimpact.gdb'
-conn_lines = os.path.join(root, 'connectivity.gdb/conn_avg_pld21_noUS')
-sg_impacts = os.path.join(root, 'main_seagrass.gdb/sg_6_imptotal')
-arcpy.env.workspace = os.path.join(root, outgdb)
-naturalness_levels = ['total_norm_1_2', 'total_norm_1_10', 'total_norm_1_100']
+outgdb = os.path.join(root, 'regional_connimpact.gdb')
+pld = 21
+conn_cube = os.path.join(os.path.dirname(root), 'conn_avg_cube.parquet') # all PLDs, from 001
+us_file = os.path.join(os.path.dirname(root), 'us_meadows.json') # US meadows, from 002
+sg_attrs = os.path.join(root, 'sg_attributes.parquet') # from 107-109
+sg_polys = os.path.join(root, 'main_seagrass.gdb/sg_5_canusa') # from 108
 
 
-# read in connectivity lines as dataframe
-field_names = [i.name for i in arcpy.ListFields(conn_lines) if i.type != 'OID']
-cursor = arcpy.da.SearchCursor(conn_lines, field_names)
-df_conn = pd.DataFrame(data=[row for row in cursor], columns=field_names)
-df_conn = df_conn.drop(['Shape', 'freq', 'totalori', 'totquant', 'Shape_Length'], axis=1)
+# read in connectivity for this PLD from the cube (only this PLD gets read)
+# without the connections that 002 removes for the US meadows (the same
+# filter, so any PLD works without rerunning 002)
+df_conn = connavg.read_cube_noUS(conn_cube, pld, us_file, columns=['from_id', 'to_id', 'prob_avg'])
 
 
 # read in impacts as df
-field_names = [i.name for i in arcpy.ListFields(sg_impacts) if i.type != 'OID']
-cursor = arcpy.da.SearchCursor(sg_impacts, field_names)
-df_imp = pd.DataFrame(data=[row for row in cursor], columns=field_names)
-df_imp = df_imp[['uID', 'total_norm_0_1', 'total_norm_1_2', 'total_norm_1_10', 'total_norm_1_100']]
+df_imp = meadowtable.read(sg_attrs, columns=['total_norm_0_1', 'total_norm_1_2', 'total_norm_1_10', 'total_norm_1_100'])
 
 
 
@@ -85,21 +86,26 @@ for uid in uIDs:
 # turn dict to dataframe
 df_all = pd.DataFrame.from_dict(s_dict)
 
-# export to arc table and join
-x = np.array(np.rec.fromrecords(df_all.values))
-names = df_all.dtypes.index.tolist()
-x.dtype.names = tuple(names)
-arcpy.da.NumPyArrayToTable(x, os.path.join(arcpy.env.workspace, f'imp_sourcesink_tbl'))
+# PageRank, eigenvector centrality and source/sink strength of each meadow for
+# each naturalness level (connection probability divided by the impact of the
+# from meadow, same as for the metapopulation model below).
+# The matrix is only built once and each level starts from the previous
+# level's result.
+# (meadows without an impact value drop out, like in the metapop model)
+probs = impacts.naturalness(df_conn_noself, df_imp)
+probs = {k: np.nan_to_num(v) for k, v in probs.items()}
+df_spec = centrality.spectral_metrics(df_conn_noself.from_id.values, df_conn_noself.to_id.values, probs)
+df_all = df_all.merge(df_spec.rename(columns={'node':'uID'}), how='left', on='uID')
 
-arcpy.env.qualifiedFieldNames = False
-jt = arcpy.AddJoin_management(sg_impacts, 'uID', 'imp_sourcesink_tbl', 'uID')
-arcpy.CopyFeatures_management(jt, 'sg_7_imptotal_sourcesink')
-arcpy.DeleteField_management('sg_7_imptotal_sourcesink', ['OBJECTID_1', 'uID_1'])
-arcpy.CopyFeatures_management('sg_7_imptotal_sourcesink', os.path.join(root, 'main_seagrass.gdb/sg_7_imptotal_sourcesink'))
+# into the attribute table
+meadowtable.update(sg_attrs, df_all)
 
-# make centroids
-arcpy.FeatureToPoint_management('sg_7_imptotal_sourcesink', 'sg_7_imptotal_sourcesink_pts', 'INSIDE')
-arcpy.CopyFeatures_management('sg_7_imptotal_sourcesink_pts', os.path.join(root, 'main_seagrass.gdb/sg_7_imptotal_sourcesink_pts'))
+# the meadow layer (polygons and points) with everything but the raw impact
+# values, since 111, 112, 200 and 204 still read it
+export_cols = [c for c in meadowtable.read(sg_attrs).columns if not c.endswith('_abs')]
+for gdb in [outgdb, os.path.join(root, 'main_seagrass.gdb')]:
+    meadowtable.export(sg_attrs, sg_polys, os.path.join(gdb, 'sg_7_imptotal_sourcesink'), columns=export_cols)
+    meadowtable.export(sg_attrs, sg_polys, os.path.join(gdb, 'sg_7_imptotal_sourcesink_pts'), columns=export_cols, points=True)
 
 
 ###############################################################
@@ -108,39 +114,18 @@ arcpy.CopyFeatures_management('sg_7_imptotal_sourcesink_pts', os.path.join(root,
 # copy over the original values of the lines)
 # This is a LINE MEADOW to MEADOW level impact.
 
-# copy connections
-arcpy.CopyFeatures_management(conn_lines, 'conn_lines_temp')
-
-# add fields for the 3 new fields
-arcpy.AddField_management('conn_lines_temp', 'probavg_BASE', 'DOUBLE')
-arcpy.AddField_management('conn_lines_temp', 'probavg_1_2', 'DOUBLE')
-arcpy.AddField_management('conn_lines_temp', 'probavg_1_10', 'DOUBLE')
-arcpy.AddField_management('conn_lines_temp', 'probavg_1_100', 'DOUBLE')
-
-# calculate 1st one as is
-arcpy.CalculateField_management('conn_lines_temp', 'probavg_BASE', '!prob_avg!')
-
-# join impacts table to it based on from_id and uID
-arcpy.env.qualifiedFieldNames = False
-jt = arcpy.AddJoin_management('conn_lines_temp', 'from_id', 'sg_7_imptotal_sourcesink_pts', 'uID')
-arcpy.CopyFeatures_management(jt, 'conn_lines_impacts')
-arcpy.Delete_management('conn_lines_temp')
-fields = ['OBJECTID_1', 'uID', 'area', 'popn', 'ow_perc', 'smodperc', 'agricult', 'cutblock', 'gcrab', 'canusa', 'ORIG_FID', 'regsink', 'regsource']
-arcpy.DeleteField_management('conn_lines_impacts', fields)
-
-# calculate the other two fields by dividing the conn prob by the impact
-fields = [
-    'probavg_BASE',
-    'probavg_1_2',
-    'probavg_1_10',
-    'probavg_1_100',
-    'total_norm_1_2',
-    'total_norm_1_10',
-    'total_norm_1_100']
-with arcpy.da.UpdateCursor('conn_lines_impacts', fields) as cursor:
-    for row in cursor:
-        row[1] = row[0] / row[4]
-        row[2] = row[0] / row[5]
-        row[3] = row[0] / row[6]
-        cursor.updateRow(row)
-
+# copy connections and get the impact of the from meadow (all the
+# total_norm_ fields, like the join used to, 202 expects them)
+conn_lines_impacts = connavg.read_cube_noUS(
+    conn_cube, pld, us_file,
+    columns=['from_id', 'to_id', 'freq', 'prob_avg', 'prob_var', 'totalori', 'totquant'],
+    geometry=True)
+conn_lines_impacts = conn_lines_impacts.merge(
+    df_imp[['uID', 'total_norm_0_1'] + [f'total_norm_{l}' for l in impacts.LEVELS]],
+    how='left', left_on='from_id', right_on='uID')
+conn_lines_impacts = conn_lines_impacts.drop(columns='uID')
+
+# the conn prob divided by the impact of the from meadow
+for level, prob in impacts.naturalness(conn_lines_impacts, df_imp).items():
+    conn_lines_impacts[f'probavg_{level}'] = prob
+attrjoin.write_layer(conn_lines_impacts, os.path.join(outgdb, 'conn_lines_impacts'))
@@ -116,7 +116,10 @@ df = df.drop(
     ['Unnamed: 0', 'Shape', 'area', 'ORIG_FID', 'canusa', 'total_norm_0_1', 
     'total_norm_1_2', 'total_norm_1_10', 'total_norm_1_100', 'regsink', 
     'regsource', 'easting'], 
-    axis=1)
+    axis=1, errors='ignore')
+# and the network metrics from 110 (pr_, ev_, srcstr_, snkstr_). ORIG_FID
+# isn't there anymore since 110 makes the points itself.
+df = df.drop([c for c in df.columns if c.split('_')[0] in ('pr', 'ev', 'srcstr', 'snkstr')], axis=1)
 
 
 #################################
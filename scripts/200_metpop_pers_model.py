@@ -3,18 +3,23 @@
 # Based on Patricks metacommunity model:
 # https://github.com/plthompson/mcomsimr/blob/master/R/MC_simulate.R
 
+import os
 import arcpy
 import pandas as pd
 import numpy as np
 import seaborn as sns
 from datetime import datetime
+import connavg
+import impacts
 
 
 
 #### Inputs ####
 
 root = r'C:\Users\jcristia\Documents\GIS\MSc_Projects\Impacts_connectivity_chap3'
-conns = os.path.join(root, r'spatial\regional_connimpact.gdb\conn_lines_impacts') # 21 day PLD
+pld = 21
+conn_cube = os.path.join(root, 'conn_avg_cube.parquet') # all PLDs, from 001
+us_file = os.path.join(root, 'us_meadows.json') # US meadows, from 002
 patches = os.path.join(root, r'spatial\regional_connimpact.gdb\sg_7_imptotal_sourcesink_pts')
 out_gdb = os.path.join(root, r'spatial\metapop_pers.gdb')
 
@@ -30,6 +35,7 @@ remove_retention = False
 
 #### Get starting population based on patch area ####
 
+patches_fc = patches
 field_names = [i.name for i in arcpy.ListFields(patches) if i.type != 'OID']
 field_names = [i.name for i in arcpy.ListFields(patches) if i.name in ['uID', 'area']]
 cursor = arcpy.da.SearchCursor(patches, field_names)
@@ -46,10 +52,17 @@ patches = patches.round({'popn':0})
 patches = patches.sort_values(by=['uID'])
 patch_pop = np.array(patches.popn)
 
-# connectivity feature class to pandas df
-field_names = [i.name for i in arcpy.ListFields(conns) if i.type != 'OID']
-cursor = arcpy.da.SearchCursor(conns, field_names)
-df = pd.DataFrame(data=[row for row in cursor], columns=field_names)
+# connectivity for this PLD, sliced out of the cube from 001 (the other PLDs
+# don't get read) without the connections 002 removes for the US meadows (the
+# same filter, so any PLD works without rerunning 002)
+df = connavg.read_cube_noUS(conn_cube, pld, us_file, columns=['from_id', 'to_id', 'prob_avg'])
+
+# naturalness levels, same as in 110: divide the connection probability by the
+# impact of the from meadow
+imp_fields = ['uID'] + [f'total_norm_{l}' for l in impacts.LEVELS]
+df_imp = pd.DataFrame(arcpy.da.FeatureClassToNumPyArray(patches_fc, imp_fields))
+for level, prob in impacts.naturalness(df, df_imp).items():
+    df[f'probavg_{level}'] = prob
 
 
 
@@ -194,5 +207,5 @@ print("Total Runtime: {}".format(datetime.now() - start_time))
 # doing this way allows me to do simulations separately and combine them later
 out_patches = out_patches.drop(columns=['area'])
 current_time = datetime.now().strftime("%y%m%d%H%M")
-out_string = f'metapop_pers_{timesteps}_{current_time}.csv'
+out_string = f'metapop_pers_{timesteps}_{current_time}_pld{pld}.csv'
 out_patches.to_csv('csv/'+out_string)
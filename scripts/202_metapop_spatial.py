@@ -3,9 +3,9 @@
 
 
 import arcpy
-import networkx as nx
 import pandas as pd
 import numpy as np
+import graphcomp
 
 
 gdb = r'C:\Users\jcristia\Documents\GIS\MSc_Projects\Impacts_connectivity_chap3\spatial\metapop_pers.gdb'
@@ -86,55 +86,16 @@ for nlevel in naturalness_levels:
             field_names = [i.name for i in arcpy.ListFields(fc)]
             cursor = arcpy.da.SearchCursor(fc, field_names)
             conns_df = pd.DataFrame(data=[row for row in cursor], columns=field_names)
-            conns_df = conns_df.drop(['OBJECTID', 'Shape', 'freq', 'totalori', 'totquant', 'Shape_Length'], 1)
-
-            # create directed graph
-            G = nx.from_pandas_edgelist(
-                conns_df, 
-                source='from_id', 
-                target='to_id', 
-                edge_attr=nlevel, 
-                create_using=nx.DiGraph)
-
-            # create undirected graph
-            H = G.to_undirected()
-
-            # identify strongly connected components
-            comps_strong = nx.strongly_connected_components(G)
-            comps = nx.connected_components(H)
-
-            # add field, give all rows -1 to start
-            conns_df[f'component_strong'] = -1
-            conns_df[f'component'] = -1
-
-            # each component is listed as SET type, which are unordered, unchangeable and don't allow duplicates
-            i = 1
-            for comp in comps:
-                c = list(comp)
-                if len(c)==1:
-                    continue
-                # add a component id to connection dataframe
-                conns_df[f'component'] = np.where(
-                    ((conns_df.from_id.isin(c)) & (conns_df.to_id.isin(c))),
-                    i,  # change it to i
-                    conns_df[f'component'] # or keep it the same
-                )
-                i+=1
-            i = 1
-            for comp in comps_strong:
-                c = list(comp)
-                if len(c)==1:
-                    continue
-                # add a component id to connection dataframe
-                conns_df[f'component_strong'] = np.where(
-                    ((conns_df.from_id.isin(c)) & (conns_df.to_id.isin(c))),
-                    i,  # change it to i
-                    conns_df[f'component_strong'] # or keep it the same
-                )
-                i+=1
+            conns_df = conns_df.drop(['OBJECTID', 'Shape', 'freq', 'totalori', 'totquant', 'Shape_Length'], axis=1)
+
+            # identify strongly connected and (weakly) connected components
+            # in one go from a sparse matrix of the connections
+            comps = graphcomp.components(conns_df.from_id.values, conns_df.to_id.values)
+            conns_df[f'component_strong'] = comps['edge_strong']
+            conns_df[f'component'] = comps['edge_weak']
 
             # output to gdb table
-            df_out = conns_df.drop(['from_id', 'to_id', 'prob_avg', 'probavg_BASE', 'probavg_1_2', 'probavg_1_10', 'total_norm_0_1', 'total_norm_1_2', 'total_norm_1_10'],1)
+            df_out = conns_df.drop(['from_id', 'to_id', 'prob_avg', 'probavg_BASE', 'probavg_1_2', 'probavg_1_10', 'total_norm_0_1', 'total_norm_1_2', 'total_norm_1_10'], axis=1)
             x = np.array(np.rec.fromrecords(df_out.values))
             names = df_out.dtypes.index.tolist()
             x.dtype.names = tuple(names)
@@ -8,24 +8,23 @@
 # A node that is a sink but sends nothing to the network it is connected to, is
 # not contributing to persistence.
 
-import arcpy
+import os
+import numpy as np
 import pandas as pd
+import attrjoin
 
 
 gdb = r'C:\Users\jcristia\Documents\GIS\MSc_Projects\Impacts_connectivity_chap3\spatial\metapop_pers.gdb'
-arcpy.env.workspace = gdb
-metapop_pers = f'metapop_pers_centroids'
+metapop_pers = os.path.join(gdb, 'metapop_pers_centroids')
 
 naturalness_levels = ['probavg_BASE', 'probavg_1_2', 'probavg_1_10', 'probavg_1_100']
 mort_rates = [0.15] # mortality rate of the settled population at each time step
 larvae_dispersing_per_adult = [0.1, 0.15, 0.2, 0.25, 0.3, 0.35, 0.4, 0.45, 0.50, 0.55, 0.6] # viable larvae produce that disperse
 
 
-# copy metapop persistence points
-arcpy.env.overwriteOutput = True
-metapop_fc = 'metapop_pers_centroids_components'
-arcpy.CopyFeatures_management(metapop_pers, metapop_fc)
-arcpy.env.overwriteOutput = False
+# output points. These are the metapop persistence points with a component
+# field for each combo. All fields get joined and written in one go at the end.
+metapop_fc = os.path.join(gdb, 'metapop_pers_centroids_components')
 
 
 # go through each nlevel-disp-r0 combo and for each uID assign which component it
@@ -37,6 +36,9 @@ arcpy.env.overwriteOutput = False
 # want to ignore it if it is persistent because of self-connection and sink 
 # connections, so I will still symbolize it in the map but with a grey color.
 
+uIDs = attrjoin.read_layer(metapop_pers, columns=['uID'], read_geometry=False).uID.values
+df_comps = pd.DataFrame({'uID': uIDs})
+
 for nlevel in naturalness_levels:
     for disp_prop in larvae_dispersing_per_adult:
         for mort in mort_rates:
@@ -44,33 +46,30 @@ for nlevel in naturalness_levels:
             str_prop = str(disp_prop).replace('.', '')
             str_mort = str(mort).split('.')[1]
 
-            # add field for component id
+            # field for component id
             field_comp = f'comp_{nlevel}_{str_prop}_{str_mort}'
-            arcpy.AddField_management(metapop_fc, field_comp, 'SHORT')
 
             # get connections associated with that pld-prop-r0 combo as pandas df
-            conns = f'conn_{nlevel}_prop{str_prop}_m{str_mort}_comps'
-            if not arcpy.Exists(conns):
-                continue # if nothing was persistent then it won't exist, can just leave the field empty
-            field_names = [i.name for i in arcpy.ListFields(conns)]
-            cursor = arcpy.da.SearchCursor(conns, field_names)
-            conns_df = pd.DataFrame(data=[row for row in cursor], columns=field_names)
-
-            # using an update cursor, for the uID, look up the from_id in the connections and get the id of the strongly connected component
-            with arcpy.da.UpdateCursor(metapop_fc, ['uID', field_comp]) as cursor:
-                for row in cursor:
-                    comp_id = conns_df.component_strong[conns_df.from_id == row[0]].reset_index(drop=True)
-                    # for a given from_id, a component id can be one id or -1
-                    if len(comp_id.unique()) > 2:
-                        print(f'uID belongs to multiple components: {row[0]}')
-                        raise ValueError('Cannot assign component')
-                    # just assign the max
-                    if len(comp_id.unique()) > 0:
-                        row[1] = comp_id.unique().max()
-                    else: # there is a meadow that has no self-connections so it doesn't appear in the connectionst list
-                        row[1] = -1
-                    cursor.updateRow(row)
-
-
-
-
+            conns = os.path.join(gdb, f'conn_{nlevel}_prop{str_prop}_m{str_mort}_comps')
+            if not attrjoin.exists(conns):
+                # if nothing was persistent then it won't exist, can just leave the field empty
+                df_comps[field_comp] = np.nan
+                continue
+            conns_df = attrjoin.read_layer(conns, columns=['from_id', 'component_strong'], read_geometry=False)
+
+            # for each from_id, look up the id of the strongly connected component
+            # for a given from_id, a component id can be one id or -1
+            comp_ids = conns_df.groupby('from_id').component_strong.agg(['nunique', 'max'])
+            multiple = comp_ids.index[comp_ids['nunique'] > 2]
+            if len(multiple) > 0:
+                print(f'uID belongs to multiple components: {multiple[0]}')
+                raise ValueError('Cannot assign component')
+            # just assign the max
+            # there is a meadow that has no self-connections so it doesn't
+            # appear in the connections list, give these -1
+            comp = comp_ids['max'].reindex(uIDs).fillna(-1).astype(np.int16)
+            df_comps[field_comp] = comp.values
+
+
+# join all component fields to the persistence points and write once
+attrjoin.join_write(metapop_pers, df_comps, out_path=metapop_fc, key='uID')
@@ -0,0 +1,72 @@
+# intermediate layers that one script makes and another one uses
+# (used by 101, 103, 104 and 105)
+
+# These used to go in the gdbs (watersheds_01_intersect, shmod_07_identity,
+# ...), which means a full write through the geodatabase and a full read back
+# every time, even when the next step is in the same script.
+# A Store keeps each layer in memory under a name. get() hands back the same
+# object (no copy, so don't edit it in place). A layer only gets written to
+# disk when checkpoint=True (or checkpoint() is called), as GeoParquet with
+# the bbox column (see attrjoin.write_layer). Then the next script (another
+# process) gets it from the file:
+#   - only the columns asked for get read (the layer still gets copied into
+#     a GeoDataFrame and all of its geometry decoded, nothing stays on disk)
+#   - with bbox, only the row groups / features near it get read (that's
+#     the spatial index: the bbox column and the row group statistics)
+# The layers that 107 combines (sg_105_freq, ...) stay in the gdbs.
+
+import os
+import geopandas as gp
+import pyarrow.parquet as pq
+from attrjoin import read_layer, write_layer
+
+
+class Store:
+
+    def __init__(self, root):
+        self.root = root
+        self.tables = {}
+
+    def path(self, name):
+        return os.path.join(self.root, f'{name}.parquet')
+
+    def __contains__(self, name):
+        return name in self.tables or os.path.exists(self.path(name))
+
+    def put(self, name, gdf, checkpoint=False):
+        self.tables[name] = gdf
+        if checkpoint:
+            self.checkpoint(name)
+        return gdf
+
+    # write a layer that's in memory to disk
+    def checkpoint(self, name):
+        os.makedirs(self.root, exist_ok=True)
+        path = self.path(name)
+        write_layer(self.tables[name].reset_index(drop=True), path, atomic=True)
+        return path
+
+    # the layer from memory if it's there, otherwise from its checkpoint
+    # bbox (xmin, ymin, xmax, ymax) only gets the features that intersect it
+    def get(self, name, columns=None, bbox=None):
+        if name in self.tables:
+            gdf = self.tables[name]
+            if columns is not None:
+                gdf = gdf[list(columns) + ['geometry']]
+            if bbox is not None:
+                gdf = gdf.cx[bbox[0]:bbox[2], bbox[1]:bbox[3]]
+            return gdf
+        return self.load(name, columns=columns, bbox=bbox)
+
+    def load(self, name, columns=None, bbox=None):
+        path = self.path(name)
+        if bbox is not None:
+            gdf = read_layer(path, columns=columns, bbox=bbox)
+        else:
+            cols = None if columns is None else list(columns) + ['geometry']
+            gdf = gp.GeoDataFrame.from_arrow(pq.read_table(path, columns=cols))
+        return gdf.drop(columns='bbox', errors='ignore')
+
+    # forget the in memory copy (the checkpoint stays)
+    def drop(self, name):
+        self.tables.pop(name, None)
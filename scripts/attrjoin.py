@@ -0,0 +1,147 @@
+# read/write layers without arcpy and join attribute tables to them in bulk
+# (used by 003 and 203)
+
+# Updating a layer with an UpdateCursor and looking up each row's uID in a
+# dataframe scans the whole dataframe for every row. Here the source table gets
+# indexed by uID once, every new column is lined up with the target layer with
+# one array take, and the layer is written out once.
+
+# Paths can be:
+#   something.gdb/layer   (file geodatabase, needs GDAL >= 3.6 to write)
+#   something.gpkg/layer  (GeoPackage)
+#   something.parquet     (GeoParquet)
+#   something.shp
+
+import os
+import json
+import numpy as np
+import pandas as pd
+import geopandas as gp
+import pyogrio
+import pyarrow.parquet as pq
+from pyproj import CRS
+
+
+# split a layer path into the data source and the layer name
+# the data source is the nearest .gdb/.gpkg folder above the layer, so a layer
+# in a feature dataset (something.gdb/GBA/TRANSPORT_LINE) works too
+def split_path(path):
+    path = os.path.normpath(path)
+    parent = os.path.dirname(path)
+    while parent and parent != os.path.dirname(parent):
+        if os.path.splitext(parent)[1].lower() in ('.gdb', '.gpkg'):
+            return parent, os.path.basename(path)
+        parent = os.path.dirname(parent)
+    return path, None
+
+def _driver(source):
+    ext = os.path.splitext(source)[1].lower()
+    return {'.gdb': 'OpenFileGDB', '.gpkg': 'GPKG', '.shp': 'ESRI Shapefile'}[ext]
+
+
+def exists(path):
+    source, layer = split_path(path)
+    if not os.path.exists(source):
+        return False
+    if layer is None:
+        return True
+    return layer in pyogrio.list_layers(source)[:, 0]
+
+
+# where is an SQL where clause, bbox (xmin, ymin, xmax, ymax) and mask (a
+# shapely geometry) only read the features that intersect them. They are
+# passed to GDAL so the other features never get loaded. All in the layer's
+# crs. (where and mask are for gdb/gpkg/shp only)
+def read_layer(path, columns=None, read_geometry=True, where=None, bbox=None, mask=None):
+    source, layer = split_path(path)
+    if source.lower().endswith('.parquet'):
+        if where is not None or mask is not None:
+            raise ValueError('where and mask are not supported for parquet files')
+        if read_geometry:
+            cols = None if columns is None else list(columns) + ['geometry']
+            return gp.read_parquet(source, columns=cols, bbox=bbox)
+        return pd.read_parquet(source, columns=columns)
+    return pyogrio.read_dataframe(
+        source, layer=layer, columns=columns, read_geometry=read_geometry, where=where,
+        bbox=bbox, mask=mask, use_arrow=True)
+
+
+def layer_crs(path):
+    source, layer = split_path(path)
+    if source.lower().endswith('.parquet'):
+        geo = json.loads(pq.read_schema(source).metadata[b'geo'])
+        return CRS.from_user_input(geo['columns'][geo['primary_column']].get('crs', 'OGC:CRS84'))
+    return pyogrio.read_info(source, layer=layer)['crs']
+
+
+# write(tmp) writes the file to a temporary path next to path, which then
+# replaces path in one step, so a half written file never gets read (by another
+# script running at the same time, or after a crash)
+def atomic_write(path, write):
+    base, ext = os.path.splitext(path)
+    tmp = f'{base}.{os.getpid()}.tmp{ext}'
+    write(tmp)
+    os.replace(tmp, path)
+
+
+def atomic_json(obj, path, **kwargs):
+    def write(tmp):
+        with open(tmp, 'w') as f:
+            json.dump(obj, f, **kwargs)
+    atomic_write(path, write)
+
+
+# atomic=True: see atomic_write (GeoParquet only)
+def write_layer(df, path, atomic=False):
+    source, layer = split_path(path)
+    if source.lower().endswith('.parquet'):
+        if atomic:
+            atomic_write(source, lambda tmp: df.to_parquet(tmp, write_covering_bbox=True))
+        else:
+            df.to_parquet(source, write_covering_bbox=True)
+        return
+    driver = _driver(source)
+    if driver == 'OpenFileGDB':
+        # gdbs for older versions of ArcGIS don't have 64 bit integers and
+        # GDAL would turn them into doubles
+        df = df.copy()
+        for c in df.columns:
+            if df[c].dtype == np.int64 and df[c].abs().max() < 2**31:
+                df[c] = df[c].astype(np.int32)
+    pyogrio.write_dataframe(df, source, layer=layer, driver=driver)
+
+
+# positions of target keys in the source table (-1 if missing)
+def key_index(target_keys, source_keys):
+    idx = pd.Index(source_keys)
+    if not idx.is_unique:
+        raise ValueError('Join key is not unique in the source table')
+    return idx.get_indexer(target_keys)
+
+
+# add columns from source to target, matched on key
+# how='left' keeps every target row (missing values are NaN), 'inner' drops
+# target rows that aren't in the source
+def join_columns(target, source, key='uID', columns=None, how='left'):
+    if columns is None:
+        columns = [c for c in source.columns if c != key]
+    pos = key_index(target[key].values, source[key].values)
+    found = pos >= 0
+    out = target.copy()
+    for c in columns:
+        vals = source[c].to_numpy()
+        col = np.take(vals, np.where(found, pos, 0))
+        if not found.all():
+            col = pd.Series(col).where(found).to_numpy()
+        out[c] = col
+    if how == 'inner':
+        out = out[found]
+    return out
+
+
+# read a layer, join the source columns and write it out in one go
+def join_write(target_path, source, out_path=None, key='uID', columns=None, how='left'):
+    target = read_layer(target_path)
+    out = join_columns(target, source, key=key, columns=columns, how=how)
+    write_layer(out, target_path if out_path is None else out_path)
+    return out
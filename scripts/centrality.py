@@ -0,0 +1,245 @@
+# network centrality for the averaged connectivity lines
+# (used by 003 and 110)
+
+# Betweenness:
+# networkx treats the edge weight as a distance, so using prob_avg as the
+# weight made the MOST probable connections the LONGEST paths. Here the path
+# length of a connection is -log(prob), so the shortest path between two
+# meadows is the most probable dispersal route (probabilities multiply along a
+# path, -log turns that into a sum).
+# It is the same algorithm as networkx (Brandes), but the source meadows are
+# split across a process pool and the partial dependency sums are added up at
+# the end. With k set, only a random sample of k sources is used and the
+# standard error of the estimate is returned as well.
+
+import os
+import numpy as np
+import pandas as pd
+from heapq import heappush, heappop
+from itertools import count
+from concurrent.futures import ProcessPoolExecutor
+from scipy import sparse
+from graphcomp import adjacency
+
+
+# probabilities to path lengths
+def path_lengths(prob):
+    return -np.log(np.asarray(prob, dtype=float))
+
+
+#### betweenness ####
+
+# graph for the worker processes, set once per process by _init_graph
+_graph = {}
+
+def _init_graph(indptr, indices, lengths):
+    _graph['indptr'] = indptr.tolist()
+    _graph['indices'] = indices.tolist()
+    _graph['lengths'] = lengths.tolist()
+    _graph['n'] = len(indptr) - 1
+
+
+# dependency of source s on every other node
+# (this is networkx's _single_source_dijkstra_path_basic and
+# _accumulate_basic on plain lists)
+def _single_source(s):
+    indptr = _graph['indptr']
+    indices = _graph['indices']
+    lengths = _graph['lengths']
+    n = _graph['n']
+
+    S = []
+    P = [[] for _ in range(n)]
+    sigma = [0.0] * n
+    sigma[s] = 1.0
+    D = {}
+    seen = {s: 0.0}
+    c = count()
+    Q = [(0.0, next(c), s, s)]
+    while Q:
+        dist, _, pred, v = heappop(Q)
+        if v in D:
+            continue
+        if v != s:
+            sigma[v] += sigma[pred]
+        S.append(v)
+        D[v] = dist
+        for e in range(indptr[v], indptr[v + 1]):
+            w = indices[e]
+            vw_dist = dist + lengths[e]
+            if w not in D and (w not in seen or vw_dist < seen[w]):
+                seen[w] = vw_dist
+                heappush(Q, (vw_dist, next(c), v, w))
+                sigma[w] = 0.0
+                P[w] = [v]
+            elif vw_dist == seen[w]:
+                sigma[w] += sigma[v]
+                P[w].append(v)
+
+    delta = np.zeros(n)
+    while S:
+        w = S.pop()
+        coeff = (1.0 + delta[w]) / sigma[w]
+        for v in P[w]:
+            delta[v] += sigma[v] * coeff
+    delta[s] = 0.0
+    return delta
+
+
+# sum and sum of squares of the dependencies for a chunk of sources
+def _chunk(sources):
+    total = np.zeros(_graph['n'])
+    total_sq = np.zeros(_graph['n'])
+    for s in sources:
+        delta = _single_source(s)
+        total += delta
+        total_sq += delta**2
+    return total, total_sq
+
+
+# betweenness centrality for every meadow
+# k=None is exact. Otherwise k sources are sampled (seeded) and bt_se is the
+# standard error of each estimate, from the spread of the per-source
+# dependencies.
+# Scaling is the same as networkx (normalized, directed, endpoints=False).
+def betweenness(from_id, to_id, prob, k=None, seed=None, max_workers=None, normalized=True):
+    A, nodes, _, _ = adjacency(from_id, to_id, path_lengths(prob))
+    A.sort_indices()
+    n = len(nodes)
+
+    if k is None or k >= n:
+        sources = np.arange(n)
+    else:
+        rng = np.random.default_rng(seed)
+        sources = np.sort(rng.choice(n, size=k, replace=False))
+    n_src = len(sources)
+
+    # a few chunks per worker so that they stay busy
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    chunks = np.array_split(sources, min(n_src, max_workers * 4))
+
+    initargs = (A.indptr, A.indices, A.data)
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_graph, initargs=initargs) as pool:
+        total = np.zeros(n)
+        total_sq = np.zeros(n)
+        for t, t_sq in pool.map(_chunk, chunks):
+            total += t
+            total_sq += t_sq
+
+    # sampled sources get scaled up to all n sources
+    mean = total / n_src
+    bt = mean * n
+    if n_src > 1 and n_src < n:
+        var = np.maximum(total_sq / n_src - mean**2, 0) * n_src / (n_src - 1)
+        # finite population correction, since sources are sampled without
+        # replacement
+        fpc = (n - n_src) / (n - 1)
+        se = n * np.sqrt(var / n_src * fpc)
+    else:
+        se = np.zeros(n)
+
+    if normalized and n > 2:
+        scale = 1.0 / ((n - 1) * (n - 2))
+        bt = bt * scale
+        se = se * scale
+
+    df = pd.DataFrame({'node': nodes, 'bt': bt})
+    if k is not None:
+        df['bt_se'] = se
+    return df
+
+
+#### spectral metrics ####
+
+# PageRank, eigenvector centrality and source/sink strength on a sparse matrix
+# of the connections.
+# The matrix structure is built once and only the probabilities get swapped
+# for each naturalness level. Each level starts its power iteration from the
+# previous level's answer, which is usually close, so it converges in a few
+# iterations. Every iteration is one sparse mat-vec (linear in connections).
+# Eigenvector centrality uses incoming connections like networkx, so a meadow
+# is central if it receives from central meadows.
+# Our network is not one connected piece (lots of separate groups of meadows
+# and small probabilities), and then the power iteration for eigenvector
+# centrality creeps along very slowly, so it gets its own looser tolerance and
+# a lot more iterations than PageRank. What the value means on a network like
+# that: the iteration ends up at the dominant eigenvector, which is only
+# nonzero in the group(s) of meadows with the largest eigenvalue (the most
+# strongly connected group) and the meadows downstream of them. Every other
+# meadow tends to 0 (but with the looser tolerance it's small, not exactly 0).
+# So compare ev_ values within a connected group, not between groups.
+
+class SpectralNetwork:
+
+    def __init__(self, from_id, to_id):
+        A, nodes, i, j = adjacency(from_id, to_id, np.arange(1, len(from_id) + 1))
+        A.sort_indices()
+        # position of each input connection in the csr data array
+        order = np.empty(len(from_id), dtype=np.int64)
+        order[A.data.astype(np.int64) - 1] = np.arange(len(A.data))
+        self.A = A
+        self.nodes = nodes
+        self.order = order
+        self.n = len(nodes)
+
+    # matrix (from x to) with the given probabilities, same structure each time
+    def matrix(self, prob):
+        A = self.A.copy()
+        A.data = np.asarray(prob, dtype=float)[np.argsort(self.order)]
+        return A
+
+    def pagerank(self, A, alpha=0.85, tol=1.0e-10, max_iter=1000, x0=None):
+        n = self.n
+        out_strength = np.asarray(A.sum(axis=1)).ravel()
+        dangling = out_strength == 0
+        inv = np.zeros(n)
+        inv[~dangling] = 1.0 / out_strength[~dangling]
+        # row normalize so each meadow hands on all of its rank
+        P = sparse.diags(inv) @ A
+        PT = P.T.tocsr()
+        x = np.full(n, 1.0 / n) if x0 is None else x0 / x0.sum()
+        for it in range(max_iter):
+            x_prev = x
+            x = alpha * (PT @ x_prev + x_prev[dangling].sum() / n) + (1 - alpha) / n
+            if np.abs(x - x_prev).sum() < n * tol:
+                return x, it + 1
+        raise RuntimeError(f'PageRank did not converge in {max_iter} iterations')
+
+    def eigenvector(self, A, tol=1.0e-6, max_iter=20000, x0=None):
+        n = self.n
+        AT = A.T.tocsr()
+        x = np.full(n, 1.0 / n) if x0 is None else x0.copy()
+        x = x / np.linalg.norm(x)
+        for it in range(max_iter):
+            x_prev = x
+            # adding x (a shift of the matrix) keeps the iteration from
+            # oscillating, the same as networkx
+            x = x_prev + AT @ x_prev
+            x = x / np.linalg.norm(x)
+            if np.abs(x - x_prev).sum() < n * tol:
+                return x, it + 1
+        raise RuntimeError(f'Eigenvector centrality did not converge in {max_iter} iterations')
+
+
+# spectral metrics for one or more sets of probabilities on the same
+# connections (e.g. one per naturalness level)
+# probs: dict of name -> probabilities in the same order as from_id/to_id
+# Returns one row per meadow with pr_, ev_, srcstr_ and snkstr_ columns for
+# each name.
+# tol/max_iter are for PageRank, ev_tol/ev_max_iter for eigenvector centrality
+def spectral_metrics(from_id, to_id, probs, tol=1.0e-10, max_iter=1000, ev_tol=1.0e-6, ev_max_iter=20000):
+    net = SpectralNetwork(from_id, to_id)
+    df = pd.DataFrame({'node': net.nodes})
+    pr = ev = None
+    for name, prob in probs.items():
+        A = net.matrix(prob)
+        pr, _ = net.pagerank(A, tol=tol, max_iter=max_iter, x0=pr)
+        ev, _ = net.eigenvector(A, tol=ev_tol, max_iter=ev_max_iter, x0=ev)
+        df[f'pr_{name}'] = pr
+        df[f'ev_{name}'] = ev
+        # source strength is the total probability going out of a meadow, sink
+        # strength is the total coming in
+        df[f'srcstr_{name}'] = np.asarray(A.sum(axis=1)).ravel()
+        df[f'snkstr_{name}'] = np.asarray(A.sum(axis=0)).ravel()
+    return df
@@ -0,0 +1,93 @@
+# the land polygon cut into small tiles, for clipping and erasing
+# (used by 101, 102 and 103)
+
+# coastline_bc_ak_wa_or_cleaned_less10000 is a few huge polygons with millions
+# of vertices. Clipping a 100m buffer to it means intersecting with the whole
+# thing. Here the land gets split into a quadtree: any piece with more than
+# max_vertices vertices gets cut into 4 by its box, until every piece is small.
+# geoproc.clip/erase only union the pieces that touch each feature (STRtree
+# query), so the work depends on how complicated the coast is near a meadow,
+# not on the whole coastline.
+# The tiles are cached (like geocache.py) so they only get made once for a
+# version of the land layer. The cache name comes from the land file's path,
+# size and modified time, not its contents, so a cached run doesn't have to
+# read millions of vertices just to hash them. For a gdb that's every file in
+# it, so writing any layer to that gdb makes the tiles again (slower, but never
+# stale).
+# The same key is used when the tiles go into geocache.cached (keyed_tiles),
+# otherwise every clip/erase call would hash all the tiles again.
+
+import os
+import hashlib
+import numpy as np
+import geopandas as gp
+import shapely
+import geoproc
+import geocache
+from attrjoin import split_path, read_layer, write_layer
+
+
+# quadtree pieces of the land polygons
+def quadtree(land, max_vertices=5000):
+    geoms = shapely.get_parts(land.geometry.values)
+    done = []
+    while len(geoms):
+        small = shapely.get_num_coordinates(geoms) <= max_vertices
+        done.append(geoms[small])
+        big = geoms[~small]
+        if len(big) == 0:
+            break
+        b = shapely.bounds(big)
+        mx = (b[:, 0] + b[:, 2]) / 2
+        my = (b[:, 1] + b[:, 3]) / 2
+        quads = np.concatenate([
+            shapely.box(b[:, 0], b[:, 1], mx, my),
+            shapely.box(mx, b[:, 1], b[:, 2], my),
+            shapely.box(b[:, 0], my, mx, b[:, 3]),
+            shapely.box(mx, my, b[:, 2], b[:, 3])])
+        pieces = shapely.intersection(np.tile(big, 4), quads)
+        # keep only the polygon parts (cutting can leave lines along the edges)
+        parts = shapely.get_parts(pieces)
+        geoms = parts[(shapely.get_dimensions(parts) == 2) & ~shapely.is_empty(parts)]
+    return gp.GeoDataFrame(geometry=np.concatenate(done), crs=land.crs)
+
+
+# path, size and modified time of the files a layer is in
+# (also the key for the tiles when they're passed to geocache.cached, so the
+# tiles never get hashed by their contents either)
+def tiles_key(path, max_vertices=5000):
+    source = os.path.abspath(split_path(path)[0])
+    if os.path.isdir(source):
+        files = sorted(os.path.join(d, f) for d, _, fs in os.walk(source) for f in fs)
+    else:
+        files = [source]
+    h = hashlib.sha256()
+    h.update(f'{os.path.abspath(path)}|{max_vertices}'.encode())
+    for f in files:
+        st = os.stat(f)
+        h.update(f'{f}|{st.st_size}|{st.st_mtime_ns}'.encode())
+    return h.hexdigest()[:24]
+
+
+# the tiles wrapped with their key, to pass to geocache.cached
+def keyed_tiles(land_path, cache_dir, max_vertices=5000):
+    return geocache.Keyed(tiles(land_path, cache_dir, max_vertices), tiles_key(land_path, max_vertices))
+
+
+# tiles for a land layer, made once and then loaded from the cache
+def tiles(land_path, cache_dir, max_vertices=5000):
+    path = os.path.join(cache_dir, f'quadtree_{tiles_key(land_path, max_vertices)}.parquet')
+    if os.path.exists(path):
+        return read_layer(path)
+    out = quadtree(read_layer(land_path, columns=[]), max_vertices).reset_index(drop=True)
+    os.makedirs(cache_dir, exist_ok=True)
+    write_layer(out, path, atomic=True)
+    return out
+
+
+def clip(gdf, land_tiles):
+    return geoproc.clip(gdf, land_tiles)
+
+
+def erase(gdf, land_tiles):
+    return geoproc.erase(gdf, land_tiles)
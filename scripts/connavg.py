@@ -0,0 +1,274 @@
+# streaming average of connectivity lines across time periods
+# (community detection env)
+
+# Each time period directory is read in a separate process and collapsed to one
+# row per edge, for every PLD in that directory. The main process folds these
+# into running per-edge sums so that only one copy of the edge table (and one
+# geometry per edge) is ever in memory.
+# Edges are keyed by packing (pld, from_id, to_id) into a single int64.
+# The sums (plus sum of squares and the list of periods already folded in) can
+# be saved to parquet and loaded again, so adding a new simulation month only
+# means reading that month's shapefiles.
+
+# The averages are written out as a "cube": one parquet file with a row group
+# per PLD, sorted by pld/from_id/to_id, and the sorted uIDs stored as an index
+# in the file metadata. read_cube() only reads the row group for the PLD that
+# is asked for.
+
+import os
+import re
+import glob
+import json
+import numpy as np
+import pandas as pd
+import geopandas as gp
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pyproj import CRS
+from scipy import sparse
+import graphcomp
+from concurrent.futures import ProcessPoolExecutor
+
+
+sum_fields = ['prob', 'prob_sq', 'totalori', 'quantity', 'count']
+
+
+# pack/unpack pld, from_id and to_id into one integer key
+# 24 bits for each uID (up to ~16 million meadows) and the rest for the PLD
+def pack_edge(from_id, to_id, pld=0):
+    from_id = np.asarray(from_id, dtype=np.int64)
+    to_id = np.asarray(to_id, dtype=np.int64)
+    pld = np.asarray(pld, dtype=np.int64)
+    return (pld << 48) | (from_id << 24) | to_id
+
+def unpack_edge(key):
+    key = np.asarray(key, dtype=np.int64)
+    return key >> 48, (key >> 24) & 0xFFFFFF, key & 0xFFFFFF
+
+
+# connectivity_pld{x}.shp files in a time period directory, by PLD
+def pld_files(period_dir):
+    files = {}
+    for shp in glob.glob(os.path.join(period_dir, 'connectivity_pld*.shp')):
+        m = re.search(r'connectivity_pld(\d+)\.shp$', shp)
+        if m:
+            files[int(m.group(1))] = shp
+    return dict(sorted(files.items()))
+
+
+# read every PLD of one time period and reduce it to per-edge sums
+# geometry goes back as WKB so that it pickles cheaply between processes
+def read_period(period_dir):
+    gdfs = []
+    for pld, shp in pld_files(period_dir).items():
+        gdf = gp.read_file(shp)
+        gdf['pld'] = pld
+        gdfs.append(gdf)
+    if len(gdfs) == 0:
+        raise FileNotFoundError(f'No connectivity_pld*.shp files in {period_dir}')
+    gdf = gp.GeoDataFrame(pd.concat(gdfs, ignore_index=True), crs=gdfs[0].crs)
+    # there's a mix of datatypes in the id columns for some reason
+    gdf = gdf.astype({'from_id':int, 'to_id':int})
+    gdf['key'] = pack_edge(gdf.from_id.values, gdf.to_id.values, gdf.pld.values)
+    gdf['count'] = 1
+    part = gdf.groupby('key').agg(
+        prob = ('prob', 'sum'),
+        totalori = ('totalori', 'sum'),
+        quantity = ('quantity', 'sum'),
+        count = ('count', 'sum'),
+        geometry = ('geometry', 'first'),
+        )
+    # square of the period total, for the variance across periods
+    part['prob_sq'] = part.prob**2
+    part['geometry'] = gp.GeoSeries(part.geometry, crs=gdf.crs).to_wkb()
+    return part, gdf.crs
+
+
+class EdgeAccumulator:
+
+    def __init__(self):
+        self.sums = pd.DataFrame(columns=sum_fields, dtype=float)
+        self.sums.index.name = 'key'
+        self.geometry = pd.Series(dtype=object, name='geometry')
+        self.periods = []
+        self.crs = None
+
+    @property
+    def n_periods(self):
+        return len(self.periods)
+
+    # add one reduced time period to the running sums
+    def fold(self, part, period, crs=None):
+        if period in self.periods:
+            raise ValueError(f'Time period already added: {period}')
+        self.sums = self.sums.add(part[sum_fields], fill_value=0)
+        # keep the geometry of the first period an edge shows up in
+        new = part.index.difference(self.geometry.index)
+        self.geometry = pd.concat([self.geometry, part.geometry.loc[new]])
+        self.periods.append(period)
+        if self.crs is None:
+            self.crs = crs
+
+    # read any time period directories that haven't been folded in yet in a
+    # process pool. map() returns them in order, so "first geometry" is the
+    # same as a serial read
+    def update(self, period_dirs, max_workers=None):
+        period_dirs = [d for d in period_dirs if d not in self.periods]
+        if len(period_dirs) == 0:
+            return self
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            for d, (part, crs) in zip(period_dirs, pool.map(read_period, period_dirs)):
+                self.fold(part, d, crs)
+        return self
+
+    # per-edge statistics across all time periods, including the ones where
+    # the edge doesn't occur (these count as 0)
+    def stats(self):
+        sums = self.sums.sort_index()
+        n = float(self.n_periods)
+        pld, from_id, to_id = unpack_edge(sums.index.values)
+        mean = sums.prob.values / n
+        var = np.maximum(sums.prob_sq.values / n - mean**2, 0)
+        return pd.DataFrame({
+            'pld': pld,
+            'from_id': from_id,
+            'to_id': to_id,
+            'freq': sums['count'].values.astype(int),
+            'prob_avg': mean,
+            'prob_var': var,
+            'totalori': sums.totalori.values.astype(int),
+            'totquant': sums.quantity.values.astype(int),
+            }, index=sums.index)
+
+    # same output as the original groupby, plus the pld and variance
+    def average(self, pld=None):
+        df = self.stats()
+        if pld is not None:
+            df = df[df.pld == pld]
+        geom = gp.GeoSeries.from_wkb(self.geometry.loc[df.index].values)
+        return gp.GeoDataFrame(df.reset_index(drop=True), geometry=geom.values, crs=self.crs)
+
+    # write the averages as a cube, one row group per PLD
+    def write_cube(self, path):
+        df = self.stats()
+        uids = np.union1d(df.from_id.values, df.to_id.values)
+        df['from_idx'] = np.searchsorted(uids, df.from_id.values).astype(np.int32)
+        df['to_idx'] = np.searchsorted(uids, df.to_id.values).astype(np.int32)
+        df['geometry'] = self.geometry.loc[df.index].values
+        df = df.astype({'pld':np.int16, 'from_id':np.int32, 'to_id':np.int32, 'freq':np.int32, 'totalori':np.int32, 'totquant':np.int32})
+        meta = {
+            'uids': uids.tolist(),
+            'plds': sorted(df.pld.unique().tolist()),
+            'periods': self.periods,
+            'crs': None if self.crs is None else CRS.from_user_input(self.crs).to_wkt(),
+            }
+        schema = pa.Schema.from_pandas(df, preserve_index=False)
+        schema = schema.with_metadata({'connavg': json.dumps(meta)})
+        with pq.ParquetWriter(path, schema) as writer:
+            for pld, df_pld in df.groupby('pld', sort=True):
+                writer.write_table(pa.Table.from_pandas(df_pld, schema=schema, preserve_index=False))
+
+    def save(self, path):
+        tbl = pa.table({
+            'key': self.sums.index.values.astype(np.int64),
+            **{f: self.sums[f].values for f in sum_fields},
+            'geometry': pa.array(self.geometry.loc[self.sums.index].values, pa.binary()),
+            })
+        meta = {
+            'periods': self.periods,
+            'crs': None if self.crs is None else CRS.from_user_input(self.crs).to_wkt(),
+            }
+        tbl = tbl.replace_schema_metadata({'connavg': json.dumps(meta)})
+        pq.write_table(tbl, path)
+
+    @classmethod
+    def load(cls, path):
+        acc = cls()
+        if not os.path.exists(path):
+            return acc
+        tbl = pq.read_table(path)
+        meta = json.loads(tbl.schema.metadata[b'connavg'])
+        df = tbl.to_pandas().set_index('key')
+        acc.sums = df[sum_fields]
+        acc.geometry = df.geometry
+        acc.periods = meta['periods']
+        acc.crs = meta['crs']
+        return acc
+
+
+#### reading the cube ####
+
+def cube_meta(path):
+    return json.loads(pq.read_schema(path).metadata[b'connavg'])
+
+# sorted uIDs. from_idx/to_idx in the cube are positions in this array.
+def cube_uids(path):
+    return np.array(cube_meta(path)['uids'])
+
+# edges for one PLD. Only that PLD's row group gets read, and geometry is only
+# decoded if asked for.
+def read_cube(path, pld, columns=None, geometry=False):
+    if columns is not None:
+        columns = list(columns) + (['geometry'] if geometry else [])
+    elif not geometry:
+        columns = [f.name for f in pq.read_schema(path) if f.name != 'geometry']
+    df = pq.read_table(path, columns=columns, filters=[('pld', '=', pld)]).to_pandas()
+    if not geometry:
+        return df
+    geom = gp.GeoSeries.from_wkb(df.pop('geometry').values)
+    return gp.GeoDataFrame(df, geometry=geom.values, crs=cube_meta(path)['crs'])
+
+# one PLD as a sparse (to x from) matrix over the whole uID index
+def cube_matrix(path, pld, value='prob_avg'):
+    df = read_cube(path, pld, columns=['from_idx', 'to_idx', value])
+    n = len(cube_uids(path))
+    return sparse.csr_matrix(
+        (df[value].values, (df.to_idx.values, df.from_idx.values)), shape=(n, n))
+
+
+#### connections without the US meadows ####
+
+# Which connections 002 drops for the US meadows. It only depends on the
+# connections of the PLD and the list of US meadows, so 110 and 200 can do the
+# same thing straight from the cube for any PLD (002 saves the list of US
+# meadows once, see save_us/read_cube_noUS) instead of needing the
+# conn_avg_pld{x}_noUS layer for every PLD.
+# The rules (see 002 for why):
+# (1) both meadows in the us and the source meadow is not also a source to Canada
+# (2) from or to is in the us and it is not part of a strongly connected
+#     component (only with apply_rule2, it never did anything in the version
+#     used for the published analysis)
+# (3) it is a connection to the states and it is not a US source
+def us_keep(from_id, to_id, us_uids, apply_rule2=False):
+    from_id = np.asarray(from_id)
+    to_id = np.asarray(to_id)
+    from_us = np.isin(from_id, us_uids)
+    to_us = np.isin(to_id, us_uids)
+    # US meadows that are sources to Canada meadows
+    us_sources = np.unique(from_id[from_us & ~to_us])
+    from_source = np.isin(from_id, us_sources)
+    to_source = np.isin(to_id, us_sources)
+    remove = (from_us & to_us & ~from_source) | (to_us & ~to_source)
+    if apply_rule2:
+        comps = graphcomp.components(from_id, to_id)
+        remove |= (from_us | to_us) & (comps['edge_strong'] == -1)
+    return ~remove
+
+
+def save_us(path, us_uids, apply_rule2=False):
+    with open(path, 'w') as f:
+        json.dump({'uIDs': [int(u) for u in us_uids], 'apply_rule2': bool(apply_rule2)}, f)
+
+
+# read_cube, without the connections 002 drops for the US meadows
+# us_file is the list of US meadows saved by 002
+def read_cube_noUS(path, pld, us_file, columns=None, geometry=False):
+    with open(us_file) as f:
+        us = json.load(f)
+    cols = None if columns is None else list(dict.fromkeys(['from_id', 'to_id'] + list(columns)))
+    df = read_cube(path, pld, columns=cols, geometry=geometry)
+    keep = us_keep(df.from_id.values, df.to_id.values, us['uIDs'], us['apply_rule2'])
+    df = df[keep].reset_index(drop=True)
+    if columns is not None:
+        df = df[list(columns) + (['geometry'] if geometry else [])]
+    return df
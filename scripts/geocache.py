@@ -0,0 +1,110 @@
+# cache of derived layers (buffers, clips, erases) on disk
+# (used by 101, 102 and 103)
+
+# 101 and 103 both buffer sg_101_retrace by 100m, 103 clips that to the
+# coastline, 102 buffers and erases land... and every rerun does it all again.
+# Here the result of a geoproc call gets saved as GeoParquet (with the bbox
+# column, see attrjoin.write_layer) under a name made from a hash of:
+#   - the function, and the code of its module and the local modules that
+#     one uses (so fixing geoproc.buffer makes new buffers)
+#   - the contents of every input layer (geometry and attributes)
+#   - every other argument (distances, ...)
+#   - or for an argument wrapped in Keyed, the key that comes with it
+# so the next call with the same inputs loads the file instead. If the meadows
+# get edited the hash changes and it gets recomputed, nothing needs to be
+# deleted by hand (old files can be cleared out whenever).
+
+import os
+import sys
+import types
+import hashlib
+import pandas as pd
+import shapely
+from attrjoin import read_layer, write_layer
+
+
+# hash of the contents of a layer
+def layer_hash(df):
+    h = hashlib.sha256()
+    if 'geometry' in df:
+        h.update(b''.join(wkb or b'' for wkb in shapely.to_wkb(df.geometry.values)))
+    attrs = df.drop(columns='geometry', errors='ignore')
+    h.update(','.join(map(str, attrs.columns)).encode())
+    if len(attrs.columns):
+        h.update(pd.util.hash_pandas_object(attrs, index=False).to_numpy().tobytes())
+    if getattr(df, 'crs', None) is not None:
+        h.update(df.crs.to_wkt().encode())
+    return h.hexdigest()
+
+
+# an argument that goes into the key by the key given with it instead of by
+# what's in it, for big layers that already have a cheap key (the land tiles,
+# see coastline.tiles_key)
+class Keyed:
+
+    def __init__(self, value, key):
+        self.value = value
+        self.key = key
+
+
+def _hash_arg(h, a):
+    if isinstance(a, Keyed):
+        h.update(a.key.encode())
+    elif isinstance(a, pd.DataFrame):
+        h.update(layer_hash(a).encode())
+    else:
+        h.update(repr(a).encode())
+
+
+def _value(a):
+    return a.value if isinstance(a, Keyed) else a
+
+
+# hash of the source files of a function's module and of the modules from this
+# folder that it uses (directly or through each other)
+_code_hashes = {}
+
+def _code_hash(func):
+    if func.__module__ in _code_hashes:
+        return _code_hashes[func.__module__]
+    here = os.path.dirname(os.path.abspath(__file__))
+    files = set()
+    todo = [sys.modules.get(func.__module__)]
+    while todo:
+        m = todo.pop()
+        f = getattr(m, '__file__', None)
+        if f is None or os.path.dirname(os.path.abspath(f)) != here or f in files:
+            continue
+        files.add(f)
+        for v in vars(m).values():
+            todo.append(v if isinstance(v, types.ModuleType) else sys.modules.get(getattr(v, '__module__', None) or ''))
+    h = hashlib.sha256()
+    for f in sorted(files):
+        with open(f, 'rb') as fh:
+            h.update(fh.read())
+    _code_hashes[func.__module__] = h.hexdigest()
+    return _code_hashes[func.__module__]
+
+
+def _key(func, args, kwargs):
+    h = hashlib.sha256()
+    h.update(f'{func.__module__}.{func.__qualname__}'.encode())
+    h.update(_code_hash(func).encode())
+    for a in args:
+        _hash_arg(h, a)
+    for k in sorted(kwargs):
+        h.update(k.encode())
+        _hash_arg(h, kwargs[k])
+    return h.hexdigest()[:24]
+
+
+# func(*args, **kwargs), or the saved result if it has been run on the same
+# inputs before
+def cached(cache_dir, func, *args, **kwargs):
+    path = os.path.join(cache_dir, f'{func.__name__}_{_key(func, args, kwargs)}.parquet')
+    if os.path.exists(path):
+        return read_layer(path)
+    out = func(*map(_value, args), **{k: _value(v) for k, v in kwargs.items()})
+    os.makedirs(cache_dir, exist_ok=True)
+    write_layer(out.reset_index(drop=True), path, atomic=True)
+    return out.reset_index(drop=True)
@@ -0,0 +1,323 @@
+# geoprocessing without arcpy
+# (used by the impact scripts, 101 to 106)
+
+# These are the arcpy tools the impact scripts use, done on geodataframes in
+# memory with shapely 2 (vectorized) and an STRtree for anything that needs to
+# find overlapping features. Nothing gets written to a gdb between steps, only
+# the layers I actually want to keep (see attrjoin.write_layer).
+
+# Field names follow what the arcpy tools produced so that the later scripts
+# still find what they expect (FREQUENCY, Shape_Area, SUM_x, ...).
+
+import os
+import sys
+import numpy as np
+import pandas as pd
+import geopandas as gp
+import shapely
+import pyogrio
+from scipy import sparse
+from scipy.sparse import csgraph
+from concurrent.futures import ThreadPoolExecutor
+from attrjoin import read_layer, write_layer, exists, layer_crs, key_index, split_path
+
+
+# read only the features of a (province wide) layer that are near the
+# features of near, e.g. the seagrass buffers.
+# The boxes around the near features (plus distance, in near's crs) are merged
+# and handed to GDAL as a spatial filter with the where clause, so features
+# far from every meadow never get read. Something like a select by location
+# is still needed after to get exact intersections.
+def read_near(path, near, distance=0, where=None, columns=None):
+    boxes = shapely.envelope(near.geometry.values)
+    if distance:
+        boxes = shapely.envelope(shapely.buffer(boxes, distance, join_style='mitre'))
+    mask = gp.GeoSeries([shapely.union_all(boxes)], crs=near.crs).to_crs(layer_crs(path))
+    return read_layer(path, columns=columns, where=where, mask=mask.values[0])
+
+
+# Buffer_analysis
+# distance can be a number, a field name or an array (one per feature)
+def buffer(gdf, distance):
+    if isinstance(distance, str):
+        distance = gdf[distance].to_numpy(dtype=float)
+    out = gdf.copy()
+    out['geometry'] = shapely.buffer(gdf.geometry.values, distance)
+    return out
+
+
+# union of the features in other that could touch each feature in gdf
+# (one STRtree query for all of them)
+def _grouped_union(gdf, other):
+    other = other.to_crs(gdf.crs)
+    left, right = other.sindex.query(gdf.geometry.values, predicate='intersects')
+    geoms = np.full(len(gdf), None, dtype=object)
+    if len(left) == 0:
+        return geoms
+    other_geoms = other.geometry.values
+    order = np.argsort(left, kind='stable')
+    left, right = left[order], right[order]
+    starts = np.flatnonzero(np.r_[True, left[1:] != left[:-1]])
+    ends = np.r_[starts[1:], len(left)]
+    for s, e in zip(starts, ends):
+        geoms[left[s]] = shapely.union_all(other_geoms[right[s:e]])
+    return geoms
+
+
+# Erase_analysis
+def erase(gdf, erase_gdf):
+    other = _grouped_union(gdf, erase_gdf)
+    hit = np.array([g is not None for g in other])
+    out = gdf.copy()
+    geoms = out.geometry.values.copy()
+    geoms[hit] = shapely.difference(geoms[hit], list(other[hit]))
+    out['geometry'] = geoms
+    return out[~out.geometry.is_empty]
+
+
+# Clip_analysis
+def clip(gdf, clip_gdf):
+    other = _grouped_union(gdf, clip_gdf)
+    hit = np.array([g is not None for g in other])
+    out = gdf[hit].copy()
+    out['geometry'] = shapely.intersection(out.geometry.values, list(other[hit]))
+    return _same_dimension(out, gdf)
+
+
+# drop pieces that aren't the same type of geometry as the input
+# (e.g. lines where two polygons only touch), like the arcpy tools do
+def _same_dimension(out, like):
+    if len(out) == 0:
+        return out
+    dim = shapely.get_dimensions(like.geometry.values).max()
+    geoms = out.geometry.values.copy()
+    collections = np.flatnonzero(shapely.get_type_id(geoms) == 7)
+    for k in collections:
+        parts = shapely.get_parts(geoms[k])
+        geoms[k] = shapely.union_all(parts[shapely.get_dimensions(parts) == dim])
+    keep = (shapely.get_dimensions(geoms) == dim) & ~shapely.is_empty(geoms)
+    out = out.copy()
+    out['geometry'] = geoms
+    return out[keep]
+
+
+# Intersect_analysis for two layers
+# attributes of both are kept, the same field name in both gets a _1
+def intersect(a, b):
+    b = b.to_crs(a.crs)
+    ia, ib = b.sindex.query(a.geometry.values, predicate='intersects')
+    geoms = shapely.intersection(a.geometry.values[ia], b.geometry.values[ib])
+    left = a.drop(columns='geometry').iloc[ia].reset_index(drop=True)
+    right = b.drop(columns='geometry').iloc[ib].reset_index(drop=True)
+    right = right.rename(columns={c: f'{c}_1' for c in right.columns if c in left.columns})
+    out = gp.GeoDataFrame(pd.concat([left, right], axis=1), geometry=geoms, crs=a.crs)
+    return _same_dimension(out, a).reset_index(drop=True)
+
+
+# Identity_analysis followed by DeleteIdentical on Shape:
+# features of a split along all the boundaries of b (so where features of b
+# overlap each other, the overlap is its own piece), with no duplicate pieces.
+# Only the attributes of a are kept.
+def identity(a, b):
+    b = b.to_crs(a.crs)
+    ia, ib = b.sindex.query(a.geometry.values, predicate='intersects')
+    b_lines = shapely.boundary(b.geometry.values)
+    a_geoms = a.geometry.values
+    rows, pieces = [], []
+    for k in range(len(a)):
+        lines = b_lines[ib[ia == k]]
+        if len(lines) == 0:
+            rows.append(k)
+            pieces.append(a_geoms[k])
+            continue
+        # node the boundaries together and rebuild the polygons, then keep the
+        # ones inside the feature
+        noded = shapely.union_all(np.concatenate([[shapely.boundary(a_geoms[k])], lines]))
+        polys = shapely.get_parts(shapely.polygonize(shapely.get_parts(noded)))
+        polys = polys[shapely.contains(a_geoms[k], shapely.point_on_surface(polys))]
+        rows.extend([k] * len(polys))
+        pieces.extend(polys)
+    out = a.drop(columns='geometry').iloc[rows].reset_index(drop=True)
+    out = gp.GeoDataFrame(out, geometry=pieces, crs=a.crs)
+    return delete_identical(_same_dimension(out, a)).reset_index(drop=True)
+
+
+# DeleteIdentical_management on the geometry
+def delete_identical(gdf):
+    wkb = shapely.to_wkb(shapely.normalize(gdf.geometry.values))
+    return gdf[~pd.Series(wkb).duplicated().values]
+
+
+# SpatialJoin_analysis, JOIN_ONE_TO_MANY
+# One row per (target, join feature) match. With keep_all, targets with no
+# match get one row with nulls. Join fields with the same name as a target
+# field get a _1. predicate is 'intersects', 'contains', 'within', ...
+def spatial_join(target, join, predicate='intersects', keep_all=True):
+    join = join.to_crs(target.crs)
+    it, ij = join.sindex.query(target.geometry.values, predicate=predicate)
+    if keep_all:
+        missing = np.setdiff1d(np.arange(len(target)), it)
+        it = np.concatenate([it, missing])
+        ij = np.concatenate([ij, np.full(len(missing), -1)])
+        order = np.argsort(it, kind='stable')
+        it, ij = it[order], ij[order]
+    left = target.iloc[it].reset_index(drop=True)
+    right = join.drop(columns='geometry').reset_index(drop=True)
+    right = right.rename(columns={c: f'{c}_1' for c in right.columns if c in left.columns})
+    right = right.reindex(ij).reset_index(drop=True)
+    return gp.GeoDataFrame(pd.concat([left, right], axis=1), geometry='geometry', crs=target.crs)
+
+
+# Frequency_analysis
+# FREQUENCY is the number of rows per group. Sums of groups that are all null
+# stay null, like arcpy.
+def frequency(df, by, sum_fields=()):
+    by = [by] if isinstance(by, str) else list(by)
+    sum_fields = [sum_fields] if isinstance(sum_fields, str) else list(sum_fields)
+    g = df.groupby(by, dropna=False)
+    out = g.size().rename('FREQUENCY').to_frame()
+    for f in sum_fields:
+        out[f] = g[f].sum(min_count=1)
+    return out.reset_index()
+
+
+# FREQUENCY from a one to many spatial join (KEEP_ALL) then Frequency_analysis:
+# a meadow with nothing joined still has its own row, so arcpy gives it 1, not 0
+# count: number of joined features per meadow (0 or NaN for none)
+def join_frequency(count):
+    return np.maximum(np.nan_to_num(np.asarray(count, dtype=float)), 1).astype(np.int32)
+
+
+# Dissolve_management
+# stats is a list of [field, 'SUM'] like arcpy. Output fields are SUM_field.
+def dissolve(gdf, by=None, stats=(), single_part=False):
+    if by is None:
+        out = gp.GeoDataFrame(geometry=[shapely.union_all(gdf.geometry.values)], crs=gdf.crs)
+    else:
+        out = gdf[[by, 'geometry']].dissolve(by=by)
+        for f, s in stats:
+            out[f'{s.upper()}_{f}'] = gdf.groupby(by)[f].agg(s.lower())
+        out = out.reset_index()
+    if single_part:
+        out = out.explode(index_parts=False).reset_index(drop=True)
+    return out
+
+
+# Dissolve_management with no fields and SINGLE_PART, split up by area
+# The features are put in square tiles (tile_size, by the centre of their
+# box) and each tile is unioned on its own, spread across threads (GEOS
+# releases the GIL, so the threads run at the same time). The pieces that
+# cross a tile edge overlap pieces from the next tile, so at the end the
+# pieces from different tiles that touch get unioned together. Each output
+# feature is one connected area, the same as a single part dissolve of
+# everything at once.
+def dissolve_tiled(gdf, tile_size=5000, max_workers=None):
+    geoms = gdf.geometry.values
+    if len(geoms) == 0:
+        return gp.GeoDataFrame(geometry=[], crs=gdf.crs)
+    bounds = shapely.bounds(geoms)
+    cx = ((bounds[:, 0] + bounds[:, 2]) / 2 // tile_size).astype(np.int64)
+    cy = ((bounds[:, 1] + bounds[:, 3]) / 2 // tile_size).astype(np.int64)
+    _, tile = np.unique(np.column_stack([cx, cy]), axis=0, return_inverse=True)
+    tile = tile.ravel()
+    groups = [geoms[tile == t] for t in range(tile.max() + 1)]
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        unions = list(pool.map(shapely.union_all, groups))
+
+    # pieces of every tile and the tile they came from
+    parts, part_tile = shapely.get_parts(np.array(unions, dtype=object), return_index=True)
+    full = ~shapely.is_empty(parts)
+    parts, part_tile = parts[full], part_tile[full]
+
+    # stitch: pieces from different tiles that touch are the same area
+    tree = shapely.STRtree(parts)
+    i, j = tree.query(parts, predicate='intersects')
+    keep = part_tile[i] != part_tile[j]
+    n = len(parts)
+    graph = sparse.csr_matrix((np.ones(keep.sum()), (i[keep], j[keep])), shape=(n, n))
+    n_comp, comp = csgraph.connected_components(graph, directed=False)
+    order = np.argsort(comp, kind='stable')
+    starts = np.flatnonzero(np.r_[True, np.diff(comp[order]) != 0])
+    pieces = np.split(parts[order], starts[1:])
+    out = [p[0] if len(p) == 1 else shapely.union_all(p) for p in pieces]
+    out = gp.GeoDataFrame(geometry=out, crs=gdf.crs)
+    return multipart_to_singlepart(out)
+
+
+# MultipartToSinglepart_management
+def multipart_to_singlepart(gdf):
+    return gdf.explode(index_parts=False).reset_index(drop=True)
+
+
+# SelectLayerByLocation_management
+def select_by_location(gdf, other, predicate='intersects'):
+    other = other.to_crs(gdf.crs)
+    idx, _ = other.sindex.query(gdf.geometry.values, predicate=predicate)
+    return gdf.iloc[np.unique(idx)]
+
+
+# RepairGeometry_management
+def repair(gdf):
+    out = gdf.copy()
+    out['geometry'] = shapely.make_valid(gdf.geometry.values)
+    return _same_dimension(out, gdf)
+
+
+# FeatureToPoint_management with INSIDE
+def to_points(gdf):
+    out = gdf.copy()
+    out['geometry'] = shapely.point_on_surface(gdf.geometry.values)
+    return out
+
+
+# MakeXYEventLayer_management
+def xy_to_points(df, x, y, crs):
+    return gp.GeoDataFrame(df, geometry=gp.points_from_xy(df[x], df[y]), crs=crs)
+
+
+# KMLToLayer_conversion, only the features of one geometry type
+# ('Point', 'Polygon', ...) from every folder in the kmz
+# GDAL calls the placemark description 'description', arcpy called it PopupInfo
+def read_kmz(path, geom_type):
+    layers = [name for name, _ in pyogrio.list_layers(path)]
+    gdfs = []
+    for layer in layers:
+        gdf = pyogrio.read_dataframe(path, layer=layer)
+        gdf = gdf.rename(columns={'description': 'PopupInfo'})
+        gdf = gdf[gdf.geometry.geom_type.str.replace('Multi', '') == geom_type]
+        gdfs.append(gdf.assign(FolderPath=layer))
+    return gp.GeoDataFrame(pd.concat(gdfs, ignore_index=True), crs=gdfs[0].crs)
+
+
+# Shape_Area/Shape_Length like a gdb feature class
+def add_geometry_fields(gdf):
+    out = gdf.copy()
+    out['Shape_Area'] = out.geometry.area
+    out['Shape_Length'] = out.geometry.length
+    return out
+
+
+# Some steps need manual edits (e.g. extending meadows to the coast). If the
+# edited layer (path) exists it gets used. If it doesn't, the starting point
+# for the edits gets written next to it with _TOEDIT added to the layer or file
+# name (x.gdb/lyr_TOEDIT, x_TOEDIT.parquet; never to path itself, so an
+# unedited layer can't be picked up by mistake) and the script stops with an
+# error (so pipeline.py doesn't carry on with the scripts after it). Edit that
+# layer and save it as path, then rerun.
+def manual_edit(gdf, path, note=''):
+    if exists(path):
+        return read_layer(path)
+    source, layer = split_path(path)
+    if layer is not None:
+        to_edit = f'{path}_TOEDIT'
+    else:
+        base, ext = os.path.splitext(path)
+        to_edit = f'{base}_TOEDIT{ext}'
+    # don't overwrite edits that are in progress
+    if not exists(to_edit):
+        write_layer(gdf, to_edit)
+    msg = f'!!! MANUAL edits needed: edit {to_edit} and save it as {path}'
+    if note:
+        msg += f'\n{note}'
+    sys.exit(msg)
@@ -0,0 +1,66 @@
+# strongly/weakly connected components of a connection edge list
+# (used by 002 and 202)
+
+# Builds a sparse adjacency matrix once from the from_id/to_id columns and gets
+# the component labels from scipy's csgraph, which is linear in the number of
+# edges. Labels follow what I did with networkx before:
+#   - components are numbered from 1
+#   - meadows in a component on their own get -1
+#   - a connection gets a component id if both of its meadows are in that
+#     component, otherwise -1
+
+import numpy as np
+from scipy import sparse
+from scipy.sparse import csgraph
+
+
+# sparse adjacency matrix (from x to) plus the sorted uIDs that the rows and
+# columns refer to
+def adjacency(from_id, to_id, weight=None):
+    from_id = np.asarray(from_id)
+    to_id = np.asarray(to_id)
+    nodes, idx = np.unique(np.concatenate([from_id, to_id]), return_inverse=True)
+    i = idx[:len(from_id)]
+    j = idx[len(from_id):]
+    if weight is None:
+        weight = np.ones(len(i))
+    n = len(nodes)
+    A = sparse.csr_matrix((np.asarray(weight, dtype=float), (i, j)), shape=(n, n))
+    return A, nodes, i, j
+
+
+# renumber raw csgraph labels: singletons to -1, the rest 1..k in order of the
+# smallest uID in each component
+def _renumber(labels):
+    sizes = np.bincount(labels)
+    _, first = np.unique(labels, return_index=True)
+    order = np.argsort(first)
+    keep = order[sizes[order] > 1]
+    new = np.full(len(sizes), -1)
+    new[keep] = np.arange(1, len(keep) + 1)
+    return new[labels]
+
+
+def _edge_labels(node_labels, i, j):
+    a = node_labels[i]
+    return np.where(a == node_labels[j], a, -1)
+
+
+# component labels for every meadow and every connection
+# Returns a dict of arrays:
+#   nodes: uIDs
+#   node_strong, node_weak: component of each uID
+#   edge_strong, edge_weak: component of each connection, in input order
+def components(from_id, to_id):
+    A, nodes, i, j = adjacency(from_id, to_id)
+    _, strong = csgraph.connected_components(A, directed=True, connection='strong')
+    _, weak = csgraph.connected_components(A, directed=True, connection='weak')
+    node_strong = _renumber(strong)
+    node_weak = _renumber(weak)
+    return {
+        'nodes': nodes,
+        'node_strong': node_strong,
+        'node_weak': node_weak,
+        'edge_strong': _edge_labels(node_strong, i, j),
+        'edge_weak': _edge_labels(node_weak, i, j),
+    }
@@ -0,0 +1,85 @@
+# the impact layers that get combined for each meadow
+# (used by 107, 109, 110 and 200)
+
+# Each impact stage (101-106) makes a table with a row per meadow. Every
+# stressor is registered here with the table it comes from, the key field and
+# the field with the value. 107 reads whatever is registered, so a new
+# stressor only needs a register() line here, nothing in 107 changes.
+# The paths are relative to the spatial folder.
+
+import os
+import numpy as np
+import pandas as pd
+import attrjoin
+
+STRESSORS = {}
+
+
+# name is what the field gets called in the combined table (popn, ...)
+def register(name, table, field, key='uID'):
+    STRESSORS[name] = {'table': table, 'field': field, 'key': key}
+
+
+register('popn', 'population.gdb/sg_105_freq', 'SUM_pop_adjusted')
+# Overwater structures:
+# sg_07a_AREA gives me AREA PERCENT. It also still has the FREQUENCY field so
+# that I can get a count.
+# sg_07b_TYPECOUNT gives me the count of structure type in each buffer. This
+# might be useful for noting the extra effects from aquaculture and wood waste
+register('ow_perc', 'overwater_structures.gdb/sg_07a_AREA', 'ow_percent')
+register('smodperc', 'shoreline_modification.gdb/sg_106_AREA', 'shmod_percent')
+register('agricult', 'agriculture_watershed.gdb/sg_105_freq', 'percent_cropland')
+register('cutblock', 'cutblocks_watershed.gdb/sg_105_freq', 'percent_cutblocks')
+register('gcrab', 'greencrab.gdb/sg_03_freq', 'gc_presence')
+
+
+# meadows x stressors matrix of the registered values (null if a meadow isn't
+# in a stressor's table)
+# Every table only gets its key and value field read. All the (meadow,
+# stressor, value) triples go in one array and get put in place with a single
+# searchsorted and fancy index assignment, instead of merging the tables one
+# after another, so adding a stressor just adds its rows.
+def gather(root, uIDs, names=None):
+    names = list(STRESSORS) if names is None else names
+    uIDs = np.unique(np.asarray(uIDs))
+    rows, cols, vals = [], [], []
+    for j, name in enumerate(names):
+        s = STRESSORS[name]
+        df = attrjoin.read_layer(
+            os.path.join(root, s['table']), columns=[s['key'], s['field']], read_geometry=False)
+        keys = df[s['key']].to_numpy()
+        rows.append(keys)
+        cols.append(np.full(len(keys), j))
+        vals.append(df[s['field']].to_numpy(dtype=float))
+    keys = np.concatenate(rows)
+    cols = np.concatenate(cols)
+    vals = np.concatenate(vals)
+    pos = np.searchsorted(uIDs, keys)
+    pos = np.minimum(pos, len(uIDs) - 1)
+    ok = uIDs[pos] == keys
+    matrix = np.full((len(uIDs), len(names)), np.nan)
+    matrix[pos[ok], cols[ok]] = vals[ok]
+    return uIDs, names, matrix
+
+
+# the matrix as a DataFrame with a uID column
+def to_frame(uIDs, names, matrix, key='uID'):
+    df = pd.DataFrame(matrix, columns=names)
+    df.insert(0, key, uIDs)
+    return df
+
+
+# naturalness levels: the connection probability divided by the impact of the
+# from meadow (total_norm_1_2, ... from 109). 110 and 200 both use these.
+LEVELS = ['1_2', '1_10', '1_100']
+
+
+# probabilities for BASE and each level, one array each in the order of conns
+# (from_id, prob_avg). Meadows without an impact value get nan.
+def naturalness(conns, df_imp, levels=LEVELS, key='uID', prob='prob_avg'):
+    imp = df_imp.set_index(key).reindex(conns.from_id.values)
+    p = conns[prob].to_numpy(dtype=float)
+    out = {'BASE': p}
+    for level in levels:
+        out[level] = p / imp[f'total_norm_{level}'].to_numpy(dtype=float)
+    return out
@@ -0,0 +1,121 @@
+# spatial join + frequency in one step
+# (used by 102 and 103)
+
+# A one to many spatial join followed by a frequency makes a table with a row
+# for every (meadow, feature) match just to add it back up again. Here the
+# matching pairs come straight from the spatial index, a chunk of meadows at a
+# time, and get added into one running total per meadow (and per category, if
+# by is given). The joined table never exists, so memory stays the same no
+# matter how many features a meadow touches.
+
+# stats is a dict of output field -> (join field, statistic), statistic is
+# one of:
+#   'count'  number of matching features (the field is ignored)
+#   'sum'    sum of the field (null if all values are null, like Frequency)
+#   'max'    max of the field
+#   'any'    1 if there is at least one match, otherwise 0
+# The join field AREA is the area of the intersection of the meadow and the
+# feature (area weighted measures without an Intersect first).
+
+import numpy as np
+import pandas as pd
+import shapely
+
+AREA = '@intersection_area'
+
+
+class PairAccumulator:
+
+    # n: number of target features (meadows)
+    # join: the join layer (its fields are looked up by position)
+    # by: a join field to also split the totals by (e.g. desc_1)
+    def __init__(self, n, join, stats, by=None):
+        self.join = join
+        self.stats = stats
+        self.by = by
+        if by is None:
+            self.categories = None
+            self.codes = None
+            self.size = n
+        else:
+            self.codes, self.categories = pd.factorize(join[by], use_na_sentinel=False)
+            self.size = n * len(self.categories)
+        self.n = n
+        self.count = np.zeros(self.size, dtype=np.int64)
+        self.sums = {}
+        self.valid = {}
+        self.max = {}
+        for name, (field, how) in stats.items():
+            if how == 'sum':
+                self.sums[name] = np.zeros(self.size)
+                self.valid[name] = np.zeros(self.size, dtype=np.int64)
+            elif how == 'max':
+                self.max[name] = np.full(self.size, np.nan)
+            elif how not in ('count', 'any'):
+                raise ValueError(f'Unknown statistic: {how}')
+
+    # add matching pairs: target positions it, join positions ij
+    # target_geoms is needed for AREA
+    def add(self, it, ij, target_geoms=None):
+        slot = it if self.by is None else it * len(self.categories) + self.codes[ij]
+        self.count += np.bincount(slot, minlength=self.size)
+        area = None
+        for name, (field, how) in self.stats.items():
+            if how not in ('sum', 'max'):
+                continue
+            if field == AREA:
+                if area is None:
+                    area = shapely.area(shapely.intersection(
+                        target_geoms[it], self.join.geometry.values[ij]))
+                values = area
+            else:
+                values = self.join[field].to_numpy(dtype=float)[ij]
+            ok = ~np.isnan(values)
+            if how == 'sum':
+                self.sums[name] += np.bincount(slot[ok], weights=values[ok], minlength=self.size)
+                self.valid[name] += np.bincount(slot[ok], minlength=self.size)
+            else:
+                np.fmax.at(self.max[name], slot[ok], values[ok])
+        return self
+
+    # one row per target (keys are the target ids, e.g. uID). With by, one row
+    # per target and category that has matches, plus one row with a null
+    # category for each target with no matches.
+    def result(self, keys, key='uID'):
+        keys = np.asarray(keys)
+        out = {}
+        for name, (field, how) in self.stats.items():
+            if how == 'count':
+                out[name] = self.count
+            elif how == 'any':
+                out[name] = (self.count > 0).astype(np.int16)
+            elif how == 'sum':
+                out[name] = np.where(self.valid[name] > 0, self.sums[name], np.nan)
+            else:
+                out[name] = self.max[name]
+        if self.by is None:
+            return pd.DataFrame({key: keys, **out})
+        n_cat = len(self.categories)
+        df = pd.DataFrame({
+            key: np.repeat(keys, n_cat),
+            self.by: np.tile(np.asarray(self.categories, dtype=object), self.n),
+            **out})
+        df = df[self.count > 0]
+        matched = self.count.reshape(self.n, n_cat).sum(axis=1) > 0
+        empty = pd.DataFrame({key: keys[~matched], self.by: None})
+        for name, (field, how) in self.stats.items():
+            empty[name] = 0 if how in ('count', 'any') else np.nan
+        return pd.concat([df, empty], ignore_index=True).sort_values(key, kind='stable').reset_index(drop=True)
+
+
+# the spatial join and the totals, a chunk of targets at a time
+# predicate is how the target relates to the join features ('intersects',
+# 'contains', ...)
+def join_aggregate(target, join, stats, key='uID', predicate='intersects', by=None, chunk_size=5000):
+    join = join.to_crs(target.crs).reset_index(drop=True)
+    geoms = target.geometry.values
+    acc = PairAccumulator(len(target), join, stats, by=by)
+    for start in range(0, len(target), chunk_size):
+        it, ij = join.sindex.query(geoms[start:start + chunk_size], predicate=predicate)
+        acc.add(it + start, ij, geoms)
+    return acc.result(target[key].to_numpy(), key=key)
@@ -0,0 +1,57 @@
+# seagrass meadow attributes in one table, keyed by uID, without geometry
+# (used by 107, 108, 109 and 110)
+
+# Every time a few impact columns changed, the whole meadow feature class got
+# copied with a join (sg_4_join, sg_4_join_norm, sg_5_canusa, sg_6_imptotal,
+# sg_7_...), rewriting every polygon just to add some numbers. Here the
+# attributes live in one parquet table with a row per uID and a column per
+# attribute. Scripts read only the columns they need and write back only the
+# columns they change. The polygons stay where they are (sg_5_canusa, written
+# once by 108) and only get joined on when a layer is exported for mapping or
+# for the scripts that still read a feature class.
+
+import os
+import pandas as pd
+import attrjoin
+import geoproc
+
+
+def read(path, columns=None, key='uID'):
+    if columns is not None:
+        columns = [key] + [c for c in columns if c != key]
+    return pd.read_parquet(path, columns=columns)
+
+
+# add or replace the values of the columns of df for the meadows in df
+# (matched on key). Meadows that aren't in the table yet get added, the other
+# columns are null for them. Meadows that aren't in df keep what they had.
+def update(path, df, key='uID'):
+    df = df.set_index(key)
+    if not os.path.exists(path):
+        table = df
+    else:
+        table = read(path, key=key).set_index(key)
+        table = table.reindex(table.index.union(df.index))
+        in_df = table.index.isin(df.index)
+        for c in df.columns:
+            new = df[c].reindex(table.index)
+            table[c] = new.where(in_df, table[c]) if c in table.columns else new
+    table = table.sort_index().reset_index()
+    attrjoin.atomic_write(path, lambda tmp: table.to_parquet(tmp, index=False))
+    return table
+
+
+# write a map layer: the geometry of geom_layer with the table columns
+# (all of them if columns is None) joined on. rename is a dict of table
+# column -> name in the layer. points=True puts a point inside each polygon.
+def export(path, geom_layer, out_path, columns=None, rename=None, points=False, key='uID'):
+    table = read(path, columns=columns, key=key)
+    if rename:
+        table = table.rename(columns=rename)
+    geoms = attrjoin.read_layer(geom_layer)
+    geoms = geoms.drop(columns=[c for c in table.columns if c != key and c in geoms.columns])
+    out = attrjoin.join_columns(geoms, table, key=key, how='inner')
+    if points:
+        out = geoproc.to_points(out)
+    attrjoin.write_layer(out, out_path)
+    return out
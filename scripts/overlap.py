@@ -0,0 +1,55 @@
+# which watersheds overlap which seagrass meadows, as a sparse matrix
+# (used by 101, 104 and 105)
+
+# 101, 104 and 105 all did the same spatial join of the extended meadows
+# (sg_103_extend) to the watersheds (watersheds_01_intersect) and then a
+# frequency to add up the watershed values for each meadow. The overlaps only
+# need to be found once. W has a 1 where meadow i touches watershed j, so the
+# total of any watershed value for each meadow is just W @ values.
+# W gets saved with the uIDs (rows) and jc_IDs (columns) it refers to. 101
+# builds it, since it creates both layers, and the other scripts load it.
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from attrjoin import key_index
+
+
+def build(sg, watersheds, sg_key='uID', ws_key='jc_ID'):
+    watersheds = watersheds.to_crs(sg.crs)
+    i, j = watersheds.sindex.query(sg.geometry.values, predicate='intersects')
+    # one row per uID, in case a meadow is in the layer more than once
+    uids, row = np.unique(sg[sg_key].to_numpy(), return_inverse=True)
+    W = sparse.csr_matrix(
+        (np.ones(len(i)), (row[i], j)), shape=(len(uids), len(watersheds)))
+    W.data[:] = 1.0
+    return W, uids, watersheds[ws_key].to_numpy()
+
+
+def save(path, W, uids, jc_ids):
+    W = W.tocsr()
+    np.savez(path, data=W.data, indices=W.indices, indptr=W.indptr,
+             shape=W.shape, uID=uids, jc_ID=jc_ids)
+
+
+def load(path):
+    f = np.load(path)
+    W = sparse.csr_matrix((f['data'], f['indices'], f['indptr']), shape=tuple(f['shape']))
+    return W, f['uID'], f['jc_ID']
+
+
+# totals of watershed fields for each meadow, like the spatial join + frequency
+# df: one row per watershed with ws_key and the fields
+# FREQUENCY is the number of watersheds that touch the meadow (1 if none do,
+# like arcpy, see geoproc.join_frequency). Watersheds that are not in df or
+# have no value count as 0.
+def to_meadows(W, uids, jc_ids, df, fields, ws_key='jc_ID'):
+    fields = [fields] if isinstance(fields, str) else list(fields)
+    pos = key_index(jc_ids, df[ws_key].to_numpy())
+    found = pos >= 0
+    out = pd.DataFrame({'uID': uids, 'FREQUENCY': np.maximum(np.asarray(W.sum(axis=1)).ravel(), 1).astype(int)})
+    for f in fields:
+        values = np.zeros(len(jc_ids))
+        values[found] = df[f].to_numpy(dtype=float)[pos[found]]
+        out[f] = W @ np.nan_to_num(values)
+    return out
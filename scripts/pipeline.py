@@ -0,0 +1,549 @@
+# run the numbered scripts, but only the ones whose inputs changed
+
+# Each script (stage) is declared below with the data it reads and writes.
+# That makes a graph: a stage depends on whichever earlier stage writes one of
+# its inputs. Before a stage runs, a hash gets made of:
+#   - the script and the helper modules it imports (so changing a parameter at
+#     the top of a script counts as a change)
+#   - every input. Inputs made by another stage use the hash that stage
+#     recorded for its output. The others (the BASE data, the green crab
+#     csv, ...) get hashed from their contents.
+# If it's the same as the last time the stage ran (and its outputs are still
+# there), the stage is skipped. If a stage reruns but writes exactly the same
+# output, the stages after it get skipped too.
+# Stages that don't depend on each other run at the same time (each in its own
+# python process), e.g. 101-106 once 100 is done. At the end it prints how
+# long each stage took and its peak memory.
+#   python pipeline.py            everything
+#   python pipeline.py impacts    the impact layers (see groups)
+#   python pipeline.py 110        110 and whatever it needs
+
+# Layers (something.gdb/layer) are hashed by what's in them (geometry and
+# attributes, see geocache.layer_hash), not by the gdb files, since a gdb has
+# the layers of several stages in it. Big inputs only get hashed again if
+# their files change (size and modified time).
+# The hashes are kept in pipeline_stamps.json in root.
+# Note: an intermediate that gets edited by hand (not by its stage) won't be
+# noticed. Put the stage in force to rerun it.
+
+import os
+import sys
+import ast
+import json
+import time
+import fnmatch
+import hashlib
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import pyogrio
+import rasterio
+import rasterio.errors
+import attrjoin
+import geocache
+import impacts
+
+
+root = r'C:\Users\jcristia\Documents\GIS\MSc_Projects\Impacts_connectivity_chap3'
+scripts_dir = os.path.dirname(os.path.abspath(__file__))
+stamp_file = os.path.join(root, 'pipeline_stamps.json')
+log_dir = os.path.join(root, 'pipeline_logs') # output of each stage
+
+# stages to bring up to date (and everything upstream of them), None for all
+targets = None
+# stages to rerun even if nothing changed
+force = []
+# how many stages can run at the same time
+max_workers = 4
+# just print what would run
+dry_run = False
+# stages that have never been run by this script but whose outputs already
+# exist get recorded as up to date instead of being run (for the first time
+# using this on a folder that already has everything in it)
+adopt_existing = False
+
+# names for sets of targets
+# impacts: all the impact layers. Once 100 is done, 100b makes what they
+# share, then 101, 102, 103 and 106 run at the same time, then 104 and 105
+# (they need the watersheds from 101, and 105 the shoreline from 103).
+groups = {
+    'impacts': ['101', '102', '103', '104', '105', '106'],
+    'connectivity': ['001', '002', '003'],
+    'metapop': ['200', '201', '202', '203', '204'],
+}
+
+hakai = r'C:\Users\jcristia\Documents\GIS\MSc_Projects\Hakai_chap1'
+base = r'C:\Users\jcristia\Documents\GIS\MSc_Projects\1Data_BASE'
+time_periods = [
+    '20200228_SS201701', '20200309_SS201705', '20200309_SS201708',
+    '20200310_SS201101', '20200310_SS201105', '20200310_SS201108',
+    '20200327_SS201401', '20200327_SS201405', '20200327_SS201408'
+]
+sg_all = os.path.join(hakai, r'scripts_runs_localstage\seagrass\seagrass\seagrass_20200228_SS\seagrass_prep\seagrass.gdb\seagrass_all_19FINAL')
+archive_gdb = r'spatial\shoreline_modification\shoreline_modification_ARCHIVED20210224.gdb'
+coast = 'spatial/main_seagrass.gdb/coastline_bc_ak_wa_or_cleaned_less10000'
+conn_lines = 'spatial/connectivity.gdb/conn_avg_pld21_noUS'
+sg_7_pts = 'spatial/regional_connimpact.gdb/sg_7_imptotal_sourcesink_pts'
+shared = 'spatial/geocache/shared.json' # buffers and land tiles from 100b
+
+# paths are relative to root (or absolute). A * in the name matches several
+# files or layers (e.g. the conn_*_comps layers from 202).
+# python: the interpreter for a stage that needs a different environment
+# (defaults to the one running this)
+# 111 isn't here, it's just testing.
+stages = {
+    '001': {
+        'script': '001_connlines_average.py',
+        'inputs': [os.path.join(hakai, rf'scripts_runs_cluster\seagrass\seagrass_{t}\shp_merged') for t in time_periods],
+        'outputs': ['conn_avg_acc.parquet', 'conn_avg_cube.parquet']},
+    '002': {
+        'script': '002_connlines_format.py',
+        'inputs': ['conn_avg_cube.parquet', sg_all, 'spatial/connectivity.gdb/select_US_poly'],
+        'outputs': ['spatial/connectivity.gdb/conn_avg_pld21', conn_lines, 'us_meadows.json']},
+    '003': {
+        'script': '003_connlines_metrics.py',
+        'inputs': [conn_lines, os.path.join(hakai, r'scripts_runs_cluster\seagrass\seagrass_20200228_SS201701\shp_merged\patch_centroids.shp')],
+        'outputs': ['spatial/connectivity.gdb/conn_metrics_pld21']},
+    '100': {
+        'script': '100_seagrass_base.py',
+        'inputs': [
+            sg_all, 'spatial/main_seagrass.gdb/erase_usa',
+            os.path.join(archive_gdb, 'sg_101_retrace'),
+            os.path.join(archive_gdb, 'coastline_bc_ak_wa_or_cleaned_less10000')],
+        'outputs': [
+            'spatial/main_seagrass.gdb/sg_1_og', 'spatial/main_seagrass.gdb/sg_2_canada',
+            'spatial/main_seagrass.gdb/sg_101_retrace', coast]},
+    '100b': {
+        'script': '100b_impacts_shared.py',
+        'inputs': ['spatial/main_seagrass.gdb/sg_101_retrace', 'spatial/main_seagrass.gdb/sg_2_canada', coast],
+        'outputs': [shared]},
+    '101': {
+        'script': '101_impacts_population.py',
+        'inputs': [
+            'spatial/main_seagrass.gdb/sg_101_retrace', coast, shared,
+            'spatial/population.gdb/sg_103_extend', # manual edits
+            os.path.join(base, r'BASE\BASE_hydrology.gdb\WHSE_BASEMAPPING_FWA_WATERSHEDS_POLY'),
+            os.path.join(base, r'Population\gpw-v4-population-count-rev11_2020_30_sec_tif\gpw_v4_population_count_rev11_2020_30_sec.tif')],
+        'outputs': [
+            'spatial/artifacts/watersheds_01_intersect.parquet', 'spatial/population.gdb/sg_105_freq',
+            'spatial/sg_watershed_overlap.npz']},
+    '102': {
+        'script': '102_impacts_overwater_structures.py',
+        'inputs': [
+            'spatial/main_seagrass.gdb/sg_2_canada', coast, shared,
+            'spatial/overwater_structures.gdb/ow_03a_KBMmanualedits', # manual edits
+            'spatial/shoreline_modification/Katherine/EelgrassContract_BannarMartin/ow_structures_TOEDIT_BannarMartin.kmz',
+            'spatial/overwater_structures/Docks&Floathomes_BC_2017.xlsx'],
+        'outputs': [
+            'spatial/overwater_structures.gdb/ow_04_merge', 'spatial/overwater_structures.gdb/sg_08_radius',
+            'spatial/overwater_structures.gdb/sg_07a_AREA', 'spatial/overwater_structures.gdb/sg_07b_TYPECOUNT']},
+    '103': {
+        'script': '103_impacts_shoreline_modification.py',
+        'inputs': [
+            'spatial/main_seagrass.gdb/sg_101_retrace', coast, shared,
+            os.path.join(base, r'Roads\dgtl_road_atlas.gdb\dgtl_road_atlas.gdb\GBA\TRANSPORT_LINE'),
+            'spatial/shoreline_modification/Katherine/EelgrassContract_BannarMartin/shoreline_mod_TOEDIT_BannarMartin.kmz'],
+        'outputs': [
+            'spatial/shoreline_modification.gdb/roads_04_dissolve', 'spatial/artifacts/shmod_07_identity.parquet',
+            'spatial/shoreline_modification.gdb/sg_106_AREA', 'spatial/shoreline_modification.gdb/sg_106_AREA_pt',
+            'spatial/shoreline_modification.gdb/sg_106_AREA_type', 'spatial/shoreline_modification.gdb/sg_106_AREA_type_pt']},
+    '104': {
+        'script': '104_impacts_agriculture_watershed.py',
+        'inputs': [
+            'spatial/artifacts/watersheds_01_intersect.parquet', 'spatial/sg_watershed_overlap.npz',
+            os.path.join(base, r'LandUse\LandUse_Canada_2010.gdb')], # raster, so the whole gdb
+        'outputs': ['spatial/agriculture_watershed.gdb/sg_105_freq']},
+    '105': {
+        'script': '105_impacts_cutblocks_watershed.py',
+        'inputs': [
+            'spatial/artifacts/watersheds_01_intersect.parquet', 'spatial/sg_watershed_overlap.npz',
+            'spatial/artifacts/shmod_07_identity.parquet',
+            os.path.join(base, r'BASE\BASE_forestry.gdb\Cut_Block_all_BC')],
+        'outputs': ['spatial/cutblocks_watershed.gdb/sg_105_freq']},
+    '106': {
+        'script': '106_impacts_greencrab_presence.py',
+        'inputs': ['spatial/main_seagrass.gdb/sg_101_retrace', 'spatial/green_crab/AllEGCPresenceRecords_DFO2020.csv'],
+        'outputs': ['spatial/greencrab.gdb/sg_03_freq', 'spatial/greencrab.gdb/sg_04_radius']},
+    '107': {
+        'script': '107_impacts_seagrass_combine.py',
+        # whatever impact layers are registered (see impacts.py)
+        'inputs': ['spatial/main_seagrass.gdb/sg_2_canada'] + sorted(set(
+            os.path.join('spatial', s['table']) for s in impacts.STRESSORS.values())),
+        'outputs': ['spatial/sg_attributes.parquet']},
+    '108': {
+        'script': '108_impacts_seagrass_append.py',
+        'inputs': [
+            'spatial/sg_attributes.parquet', 'spatial/connectivity.gdb/conn_metrics_pld21',
+            'spatial/main_seagrass.gdb/sg_1_og', 'spatial/main_seagrass.gdb/sg_2_canada'],
+        'outputs': ['spatial/sg_attributes.parquet', 'spatial/main_seagrass.gdb/sg_5_canusa']},
+    '109': {
+        'script': '109_impacts_seagrass_standardize.py',
+        'inputs': ['spatial/sg_attributes.parquet'],
+        'outputs': ['spatial/sg_attributes.parquet']},
+    '110': {
+        'script': '110_impacts_regional_connimpact.py',
+        'inputs': ['conn_avg_cube.parquet', 'us_meadows.json', 'spatial/sg_attributes.parquet', 'spatial/main_seagrass.gdb/sg_5_canusa'],
+        'outputs': [
+            'spatial/sg_attributes.parquet',
+            'spatial/regional_connimpact.gdb/sg_7_imptotal_sourcesink', sg_7_pts,
+            'spatial/main_seagrass.gdb/sg_7_imptotal_sourcesink',
+            'spatial/main_seagrass.gdb/sg_7_imptotal_sourcesink_pts',
+            'spatial/regional_connimpact.gdb/conn_lines_impacts']},
+    '112': {
+        'script': '112_impacts_pca.py',
+        'inputs': ['spatial/main_seagrass.gdb/sg_7_imptotal_sourcesink_pts'],
+        'outputs': ['scripts/csv/sg_pca.csv']},
+    '200': {
+        'script': '200_metpop_pers_model.py',
+        'inputs': ['conn_avg_cube.parquet', 'us_meadows.json', sg_7_pts],
+        'outputs': ['scripts/csv/metapop_pers_*']},
+    '201': {
+        'script': '201_metapop_join.py',
+        'inputs': ['scripts/csv/metapop_pers_*', os.path.join(hakai, r'scripts_runs_cluster\seagrass\seagrass_20200228_SS201701\seagrass_1\outputs\shp\patch_centroids.shp')],
+        'outputs': ['spatial/metapop_pers.gdb/metapop_pers_centroids']},
+    '202': {
+        'script': '202_metapop_spatial.py',
+        'inputs': ['spatial/metapop_pers.gdb/metapop_pers_centroids', 'spatial/regional_connimpact.gdb/conn_lines_impacts'],
+        'outputs': ['spatial/metapop_pers.gdb/conn_*_comps']},
+    '203': {
+        'script': '203_metapop_linkcomp.py',
+        'inputs': ['spatial/metapop_pers.gdb/metapop_pers_centroids', 'spatial/metapop_pers.gdb/conn_*_comps'],
+        'outputs': ['spatial/metapop_pers.gdb/metapop_pers_centroids_components']},
+    '204': {
+        'script': '204_metapop_plotting.py',
+        'inputs': ['spatial/metapop_pers.gdb/metapop_pers_centroids', sg_7_pts],
+        'outputs': ['scripts/figs/sgpersistent.svg']},
+}
+
+
+####################################################
+# hashing
+
+def _path(p):
+    return os.path.normpath(p if os.path.isabs(p) else os.path.join(root, p))
+
+
+# the files a path is made of (a gdb or a folder is all the files in it)
+def _files(path):
+    if os.path.isdir(path):
+        return sorted(os.path.join(d, f) for d, _, fs in os.walk(path) for f in fs)
+    return [path] if os.path.exists(path) else []
+
+
+# quick check of whether any files changed (size and modified time)
+def _signature(paths):
+    h = hashlib.sha256()
+    for f in paths:
+        st = os.stat(f)
+        h.update(f'{f}|{st.st_size}|{st.st_mtime_ns}'.encode())
+    return h.hexdigest()
+
+
+def _file_hash(paths, source):
+    h = hashlib.sha256()
+    for f in paths:
+        h.update(os.path.relpath(f, source).encode())
+        with open(f, 'rb') as fh:
+            for chunk in iter(lambda: fh.read(1 << 20), b''):
+                h.update(chunk)
+    return h.hexdigest()
+
+
+# files or layers a path (maybe with a *) matches ([] if there aren't any)
+def _expand(path):
+    source, layer = attrjoin.split_path(path)
+    if layer is not None:
+        if not os.path.exists(source):
+            return []
+        layers = pyogrio.list_layers(source)[:, 0]
+        if '*' not in layer and layer not in layers:
+            # rasters in a gdb don't get listed with the layers
+            return [path] if _gdb_raster(source, layer) else []
+        return [os.path.join(source, l) for l in sorted(layers) if fnmatch.fnmatch(l, layer)]
+    if '*' in os.path.basename(path):
+        d = os.path.dirname(path)
+        if not os.path.isdir(d):
+            return []
+        return [os.path.join(d, f) for f in sorted(os.listdir(d)) if fnmatch.fnmatch(f, os.path.basename(path))]
+    return [path] if os.path.exists(path) else []
+
+
+def _gdb_raster(source, layer):
+    if not source.lower().endswith('.gdb'):
+        return False
+    try:
+        with rasterio.open(f'OpenFileGDB:{source}:{layer}'):
+            return True
+    except rasterio.errors.RasterioIOError:
+        return False
+
+
+class Hasher:
+
+    # memo: path -> [signature, hash] from the last run
+    def __init__(self, memo):
+        self.memo = memo
+        self.lock = threading.Lock()
+
+    def _one(self, path):
+        source, layer = attrjoin.split_path(path)
+        files = _files(source)
+        sig = _signature(files)
+        with self.lock:
+            if path in self.memo and self.memo[path][0] == sig:
+                return self.memo[path][1]
+        if layer is None or layer not in pyogrio.list_layers(source)[:, 0]:
+            # a file, a folder or a raster in a gdb (all the files of the gdb,
+            # there's no telling which of them are the raster's)
+            h = _file_hash(files, source)
+        else:
+            h = geocache.layer_hash(attrjoin.read_layer(path))
+        with self.lock:
+            self.memo[path] = [sig, h]
+        return h
+
+    # hash of a path (None if it doesn't exist)
+    def __call__(self, p):
+        paths = _expand(_path(p))
+        if not paths:
+            return None
+        h = hashlib.sha256()
+        for path in paths:
+            h.update(f'{os.path.basename(path)}:{self._one(path)}'.encode())
+        return h.hexdigest()
+
+
+# the script and the local modules it imports (and that they import)
+def _modules(script):
+    todo = [os.path.join(scripts_dir, script)]
+    found = []
+    while todo:
+        f = todo.pop()
+        if f in found:
+            continue
+        found.append(f)
+        with open(f) as fh:
+            tree = ast.parse(fh.read())
+        for node in ast.walk(tree):
+            names = []
+            if isinstance(node, ast.Import):
+                names = [a.name for a in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.module:
+                names = [node.module]
+            for n in names:
+                m = os.path.join(scripts_dir, n.split('.')[0] + '.py')
+                if os.path.exists(m):
+                    todo.append(m)
+    return sorted(found)
+
+
+####################################################
+# the graph
+
+# the stage that writes each input (the last one declared before this stage)
+def dependencies(stages):
+    deps = {}
+    writers = {}
+    for name, s in stages.items():
+        deps[name] = {}
+        for p in s['inputs']:
+            for out, writer in reversed(list(writers.items())):
+                if fnmatch.fnmatch(_path(p), out) or fnmatch.fnmatch(out, _path(p)):
+                    deps[name][p] = writer
+                    break
+        for p in s['outputs']:
+            writers.pop(_path(p), None)
+            writers[_path(p)] = name
+    return deps
+
+
+# the targets and everything upstream of them
+def upstream(deps, targets):
+    keep = set()
+    todo = list(targets)
+    while todo:
+        t = todo.pop()
+        if t not in keep:
+            keep.add(t)
+            todo.extend(deps[t].values())
+    return [s for s in deps if s in keep]
+
+
+def _load_stamps():
+    if os.path.exists(stamp_file):
+        with open(stamp_file) as f:
+            return json.load(f)
+    return {'stages': {}, 'hashes': {}}
+
+
+def _save_stamps(stamps):
+    attrjoin.atomic_json(stamps, stamp_file, indent=1)
+
+
+####################################################
+# running
+
+# run a script in its own process and measure it
+# Returns the exit code, wall time (s), cpu time (s) and peak memory (MB).
+# On Linux/mac these come from os.wait4 (the rusage of that process). On
+# Windows the peak memory comes from the process handle before it's closed
+# and the cpu time isn't available (None).
+def run_measured(cmd, cwd, log):
+    t0 = time.perf_counter()
+    p = subprocess.Popen(cmd, cwd=cwd, stdout=log, stderr=subprocess.STDOUT)
+    if hasattr(os, 'wait4'):
+        _, status, ru = os.wait4(p.pid, 0)
+        p.returncode = os.waitstatus_to_exitcode(status)
+        wall = time.perf_counter() - t0
+        # ru_maxrss is in KB on Linux, bytes on mac
+        peak = ru.ru_maxrss / (1024 ** 2 if sys.platform == 'darwin' else 1024)
+        return p.returncode, wall, ru.ru_utime + ru.ru_stime, peak
+    p.wait()
+    wall = time.perf_counter() - t0
+    return p.returncode, wall, None, _peak_memory_windows(p)
+
+
+def _peak_memory_windows(p):
+    import ctypes
+    from ctypes import wintypes
+
+    class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+        _fields_ = [
+            ('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD),
+            ('PeakWorkingSetSize', ctypes.c_size_t), ('WorkingSetSize', ctypes.c_size_t),
+            ('QuotaPeakPagedPoolUsage', ctypes.c_size_t), ('QuotaPagedPoolUsage', ctypes.c_size_t),
+            ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t), ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+            ('PagefileUsage', ctypes.c_size_t), ('PeakPagefileUsage', ctypes.c_size_t)]
+
+    counters = PROCESS_MEMORY_COUNTERS()
+    counters.cb = ctypes.sizeof(counters)
+    ok = ctypes.windll.psapi.GetProcessMemoryInfo(
+        wintypes.HANDLE(int(p._handle)), ctypes.byref(counters), counters.cb)
+    return counters.PeakWorkingSetSize / 1024 ** 2 if ok else None
+
+
+def run(stages, targets=None, force=(), max_workers=4, dry_run=False, adopt_existing=False):
+    deps = dependencies(stages)
+    if targets:
+        targets = [t for g in targets for t in groups.get(g, [g])]
+        unknown = [t for t in targets if t not in stages]
+        if unknown:
+            sys.exit(f'unknown stage or group: {", ".join(unknown)}\n'
+                     f'stages: {", ".join(stages)}\ngroups: {", ".join(groups)}')
+    todo = upstream(deps, targets) if targets else list(stages)
+    measured = {}
+    stamps = _load_stamps()
+    hasher = Hasher(stamps['hashes'])
+    lock = threading.Lock()
+    os.makedirs(log_dir, exist_ok=True)
+
+    # key of a stage: hash of its code and inputs
+    def stage_key(name):
+        s = stages[name]
+        h = hashlib.sha256()
+        for m in _modules(s['script']):
+            h.update(hasher(m).encode())
+        for p in s['inputs']:
+            # the hash the stage that made it recorded (if it's one of the
+            # outputs as declared there, not just matching a *)
+            ih = None
+            if p in deps[name]:
+                with lock:
+                    ih = stamps['stages'][deps[name][p]]['outputs'].get(p)
+            if ih is None:
+                ih = hasher(p)
+            if ih is None:
+                # a missing input (or one that can't be read, e.g. a wrong
+                # layer name) would otherwise just hash the same every time
+                raise FileNotFoundError(f'input of {name} not found: {_path(p)}')
+            h.update(f'{p}={ih}'.encode())
+        h.update(repr(s.get('python')).encode())
+        return h.hexdigest()
+
+    def record(name, key):
+        outputs = {p: hasher(p) for p in stages[name]['outputs']}
+        with lock:
+            stamps['stages'][name] = {'key': key, 'outputs': outputs, 'time': time.ctime()}
+            _save_stamps(stamps)
+
+    # run one stage if it needs it. Returns 'ran', 'skipped' or 'failed'
+    def do(name):
+        s = stages[name]
+        key = stage_key(name)
+        outputs_there = all(hasher(p) is not None for p in s['outputs'])
+        with lock:
+            last = stamps['stages'].get(name)
+        if name not in force and outputs_there:
+            if last is not None and last['key'] == key:
+                return 'skipped'
+            if last is None and adopt_existing:
+                record(name, key)
+                return 'skipped'
+        if dry_run:
+            # everything downstream would get rerun
+            return 'ran'
+        print(f'{name}: running {s["script"]}', flush=True)
+        with open(os.path.join(log_dir, f'{name}.log'), 'w') as log:
+            code, wall, cpu, peak = run_measured(
+                [s.get('python', sys.executable), s['script']], scripts_dir, log)
+        measured[name] = (wall, cpu, peak)
+        if code != 0:
+            print(f'{name}: failed, see {os.path.join(log_dir, name + ".log")}', flush=True)
+            return 'failed'
+        record(name, key)
+        with lock:
+            stamps['stages'][name]['measured'] = {'wall': wall, 'cpu': cpu, 'peak_mb': peak}
+            _save_stamps(stamps)
+        print(f'{name}: done in {wall:.0f}s', flush=True)
+        return 'ran'
+
+    status = {}
+    running = {}
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while len(status) < len(todo):
+            n_status = len(status)
+            for name in todo:
+                if name in status or name in running.values():
+                    continue
+                up = set(deps[name].values()) & set(todo)
+                if any(status.get(u) == 'failed' or status.get(u) == 'not run' for u in up):
+                    status[name] = 'not run'
+                elif dry_run and any(status.get(u) == 'ran' for u in up):
+                    # the inputs would change, no point hashing them
+                    status[name] = 'ran'
+                elif all(u in status for u in up):
+                    running[pool.submit(do, name)] = name
+            if not running:
+                if len(status) > n_status:
+                    continue
+                # nothing running and nothing could start. Shouldn't happen (a
+                # stage only depends on stages declared before it), but stop
+                # instead of looping forever
+                blocked = [n for n in todo if n not in status]
+                sys.exit('stuck, these stages are waiting on stages that never finished:\n' + '\n'.join(
+                    f'  {n} needs {", ".join(sorted(set(deps[n].values()) - set(status)))}' for n in blocked))
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for f in done:
+                name = running.pop(f)
+                try:
+                    status[name] = f.result()
+                except Exception as e:
+                    print(f'{name}: {e!r}', flush=True)
+                    status[name] = 'failed'
+
+    # what ran, how long it took and how much memory it needed
+    label = {'ran': 'would run', 'skipped': 'up to date'} if dry_run else {}
+    print(f'{"stage":<6}{"":<11}{"wall s":>9}{"cpu s":>9}{"peak MB":>10}')
+    for name in todo:
+        wall, cpu, peak = measured.get(name, (None, None, None))
+        row = [f'{x:.1f}' if x is not None else '' for x in (wall, cpu, peak)]
+        print(f'{name:<6}{label.get(status[name], status[name]):<11}{row[0]:>9}{row[1]:>9}{row[2]:>10}')
+    if not dry_run:
+        print(f'total {time.perf_counter() - t0:.1f}s')
+    return status
+
+
+if __name__ == '__main__':
+    run(stages, targets=sys.argv[1:] or targets, force=force, max_workers=max_workers,
+        dry_run=dry_run, adopt_existing=adopt_existing)
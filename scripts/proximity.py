@@ -0,0 +1,78 @@
+# which points (e.g. green crab records, docks) are within a distance of
+# which polygons (e.g. seagrass meadows)
+# (used by 102 and 106)
+
+# Before, every point got buffered and the buffers got spatially joined to the
+# meadows. Here the points go in a KD-tree (scipy cKDTree) and each meadow asks
+# for the points within (distance + the radius of the meadow's box) of the
+# centre of its box. That is every point that could be close enough, and the
+# exact distance from the meadow polygon to each of those candidates decides.
+# No buffer polygons get made, and since the distances are kept, any distance
+# up to the one queried can be checked afterwards without another query.
+# Points and polygons have to be in the same projected crs.
+
+import numpy as np
+import pandas as pd
+import shapely
+from scipy.spatial import cKDTree
+
+
+class PointTree:
+
+    def __init__(self, points):
+        self.points = points.geometry.values
+        xy = np.column_stack([shapely.get_x(self.points), shapely.get_y(self.points)])
+        self.tree = cKDTree(xy)
+
+    # every (polygon, point) pair closer than max_distance, with the distance
+    # poly and point are positions in the polygon and point layers
+    def pairs(self, polys, max_distance):
+        geoms = polys.geometry.values
+        b = shapely.bounds(geoms)
+        centre = np.column_stack([(b[:, 0] + b[:, 2]) / 2, (b[:, 1] + b[:, 3]) / 2])
+        radius = np.hypot(b[:, 2] - b[:, 0], b[:, 3] - b[:, 1]) / 2
+        cand = self.tree.query_ball_point(centre, radius + max_distance)
+        n_cand = np.array([len(c) for c in cand])
+        i = np.repeat(np.arange(len(geoms)), n_cand)
+        j = np.concatenate(cand).astype(np.int64) if n_cand.sum() else np.zeros(0, dtype=np.int64)
+        dist = shapely.distance(geoms[i], self.points[j])
+        close = dist <= max_distance
+        return pd.DataFrame({'poly': i[close], 'point': j[close], 'distance': dist[close]})
+
+
+# count of the points (or sum of values, one per point) within distance of
+# each of n polygons, from pairs. Null values count as 0.
+def within(pairs, n, distance, values=None):
+    close = pairs[pairs.distance <= distance]
+    weights = None
+    if values is not None:
+        weights = np.nan_to_num(np.asarray(values, dtype=float))[close.point.to_numpy()]
+    return np.bincount(close.poly.to_numpy(), weights=weights, minlength=n)
+
+
+# counts/sums for several distances at once, from pairs queried with the
+# largest one
+# Each pair goes in the bin of the smallest distance that it is within, the
+# bins get added up and then summed cumulatively, so each wider distance just
+# adds its ring to the narrower one.
+# keys: id of each polygon (e.g. uID)
+# stressors: dict of name -> None (count of points) or values (one per point)
+# Returns one row per polygon, distance and stressor (long format).
+def radius_table(pairs, keys, radii, stressors, key='uID'):
+    radii = np.sort(np.asarray(radii, dtype=float))
+    n = len(keys)
+    ring = np.searchsorted(radii, pairs.distance.to_numpy(), side='left')
+    inside = ring < len(radii)
+    flat = pairs.poly.to_numpy()[inside] * len(radii) + ring[inside]
+    point = pairs.point.to_numpy()[inside]
+    tables = []
+    for name, values in stressors.items():
+        weights = None if values is None else np.nan_to_num(np.asarray(values, dtype=float))[point]
+        sums = np.bincount(flat, weights=weights, minlength=n * len(radii))
+        sums = np.cumsum(sums.reshape(n, len(radii)), axis=1)
+        tables.append(pd.DataFrame({
+            key: np.repeat(np.asarray(keys), len(radii)),
+            'radius': np.tile(radii, n),
+            'stressor': name,
+            'value': sums.ravel()}))
+    return pd.concat(tables, ignore_index=True)
@@ -0,0 +1,193 @@
+# raster statistics for zones (e.g. watersheds)
+# (used by 101 and 104)
+
+#### zonal_sum ####
+
+# sum of a count raster (e.g. population) in each zone, on land only
+
+# Before, every raster cell became a polygon, got clipped to land, intersected
+# with the watersheds and then each piece got its share of the cell's count by
+# area. That makes hundreds of thousands of polygons just to get one number per
+# watershed. Here the raster is read one window at a time (the bounding box of
+# each zone) and the share of each cell is calculated directly. Like before
+# (clip to land, multipart to singlepart, then area_orig of each part), every
+# separate piece of land in a cell gets the cell's whole count spread evenly
+# over it:
+#
+#   share = sum over land pieces p in the cell of area(p & zone) / area(p)
+#
+# A cell that is mostly water over a small island keeps all of its people on
+# the island. (A cell over two islands counts twice, once for each, same as
+# the arcpy version.)
+# Only the cells in one window are in memory at a time.
+
+import os
+import numpy as np
+import pandas as pd
+import geopandas as gp
+import shapely
+import rasterio
+import rasterio.features
+import rasterio.windows
+import rasterio.errors
+from concurrent.futures import ProcessPoolExecutor
+from attrjoin import split_path
+
+
+# path that GDAL (rasterio) can open. A raster inside a file gdb
+# (something.gdb/landuse_2010) has to be given as OpenFileGDB:<gdb>:<raster>
+# (needs GDAL >= 3.7), anything else (a tif, ...) is opened as it is
+def _raster_path(path):
+    source, layer = split_path(path)
+    if layer is not None and source.lower().endswith('.gdb'):
+        return f'OpenFileGDB:{source}:{layer}'
+    return path
+
+
+# window of the raster that covers bounds (in the raster crs), snapped out to
+# whole cells and cut to the raster extent
+def _window(src, bounds):
+    window = rasterio.windows.from_bounds(*bounds, transform=src.transform)
+    col0, row0 = int(np.floor(window.col_off)), int(np.floor(window.row_off))
+    col1 = int(np.ceil(window.col_off + window.width))
+    row1 = int(np.ceil(window.row_off + window.height))
+    window = rasterio.windows.Window(col0, row0, col1 - col0, row1 - row0)
+    full = rasterio.windows.Window(0, 0, src.width, src.height)
+    try:
+        window = window.intersection(full)
+    except rasterio.errors.WindowError:
+        return None
+    return rasterio.windows.Window(
+        int(window.col_off), int(window.row_off), int(window.width), int(window.height))
+
+
+# cells of a window that have a count, as polygons in area_crs
+def _cells(src, window, area_crs):
+    values = src.read(1, window=window, masked=True)
+    rows, cols = np.nonzero(~np.ma.getmaskarray(values) & (values.filled(0) > 0))
+    if len(rows) == 0:
+        return None, None
+    transform = src.window_transform(window)
+    x0, y0 = transform * (cols, rows)
+    x1, y1 = transform * (cols + 1, rows + 1)
+    cells = gp.GeoSeries(shapely.box(x0, y1, x1, y0), crs=src.crs).to_crs(area_crs)
+    return cells.values, np.asarray(values[rows, cols], dtype=float)
+
+
+# raster_path: count raster
+# zones: polygons with a key field
+# land: polygons. Cells only count the part of them that is on land. None to
+# use the whole cell.
+# area_crs: projected crs that the areas are calculated in
+# Returns a dataframe with key and the summed count (0 for zones with no cells
+# on land).
+def zonal_sum(raster_path, zones, key, land=None, area_crs=3005, out_field='count'):
+    zones_a = zones.to_crs(area_crs)
+    if land is not None:
+        land_a = land.to_crs(area_crs)
+        land_geoms = land_a.geometry.values
+    totals = np.zeros(len(zones))
+
+    with rasterio.open(_raster_path(raster_path)) as src:
+        zones_r = zones.to_crs(src.crs)
+        for k in range(len(zones)):
+            window = _window(src, zones_r.geometry.values[k].bounds)
+            if window is None:
+                continue
+            cells, values = _cells(src, window, area_crs)
+            if cells is None:
+                continue
+            zone = zones_a.geometry.values[k]
+            # only cells that touch the zone matter
+            hit = shapely.intersects(cells, zone)
+            cells, values = cells[hit], values[hit]
+            if land is None:
+                cell_land = cells
+            else:
+                near = land_a.sindex.query(shapely.box(*shapely.total_bounds(cells)), predicate='intersects')
+                if len(near) == 0:
+                    continue
+                cell_land = shapely.intersection(cells, shapely.union_all(land_geoms[near]))
+            # single parts, each with the count of its cell
+            parts, cell_idx = shapely.get_parts(cell_land, return_index=True)
+            den = shapely.area(parts)
+            num = shapely.area(shapely.intersection(parts, zone))
+            share = np.divide(num, den, out=np.zeros_like(num), where=den > 0)
+            totals[k] = (values[cell_idx] * share).sum()
+
+    return pd.DataFrame({key: zones[key].values, out_field: totals})
+
+
+#### zonal_class_count ####
+
+# number (and area) of cells of one class (e.g. cropland in a land use raster)
+# in each zone
+# Before, the class cells of the whole raster got turned into polygons and
+# intersected with the watersheds. Here the zones are rasterized onto the
+# raster grid instead, one tile at a time, and the class cells are counted with
+# a bincount on the zone number. Nothing gets vectorized. The tiles are split
+# across a process pool.
+# A cell belongs to a zone if its centre is in the zone. Zones shouldn't
+# overlap (if they do, a cell only counts for one of them).
+
+# zones for the worker processes, set once per process by _init_tiles
+_tiles = {}
+
+def _init_tiles(raster_path, zone_wkb, value):
+    _tiles['src'] = rasterio.open(raster_path)
+    _tiles['zones'] = shapely.from_wkb(zone_wkb)
+    _tiles['tree'] = shapely.STRtree(_tiles['zones'])
+    _tiles['value'] = value
+
+
+# class cell count per zone (index 0 is cells in no zone) for one tile
+def _count_tile(window):
+    src = _tiles['src']
+    zones = _tiles['zones']
+    n = len(zones)
+    transform = src.window_transform(window)
+    tile_box = shapely.box(*rasterio.windows.bounds(window, src.transform))
+    near = _tiles['tree'].query(tile_box, predicate='intersects')
+    if len(near) == 0:
+        return np.zeros(n + 1, dtype=np.int64)
+    values = src.read(1, window=window)
+    is_class = values == _tiles['value']
+    if not is_class.any():
+        return np.zeros(n + 1, dtype=np.int64)
+    zone_idx = rasterio.features.rasterize(
+        zip(zones[near], near + 1),
+        out_shape=values.shape,
+        transform=transform,
+        fill=0,
+        dtype=np.int32)
+    return np.bincount(zone_idx[is_class], minlength=n + 1)
+
+
+# raster_path: categorical raster
+# zones: polygons with a key field
+# value: the class to count
+# tile_size: tile width/height in cells
+# Returns a dataframe with key, count and area (count * cell area, in the
+# units of the raster crs).
+def zonal_class_count(raster_path, zones, key, value, tile_size=2048, max_workers=None):
+    raster_path = _raster_path(raster_path)
+    with rasterio.open(raster_path) as src:
+        zones_r = zones.to_crs(src.crs)
+        cell_area = abs(src.transform.a * src.transform.e)
+        window = _window(src, zones_r.total_bounds)
+    counts = np.zeros(len(zones) + 1, dtype=np.int64)
+    if window is not None:
+        tiles = [
+            rasterio.windows.Window(c, r,
+                min(tile_size, window.col_off + window.width - c),
+                min(tile_size, window.row_off + window.height - r))
+            for r in range(window.row_off, window.row_off + window.height, tile_size)
+            for c in range(window.col_off, window.col_off + window.width, tile_size)]
+        if max_workers is None:
+            max_workers = os.cpu_count() or 1
+        initargs = (raster_path, shapely.to_wkb(zones_r.geometry.values), value)
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_tiles, initargs=initargs) as pool:
+            for c in pool.map(_count_tile, tiles):
+                counts += c
+    counts = counts[1:]
+    return pd.DataFrame({key: zones[key].values, 'count': counts, 'area': counts * cell_area})